@@ -42,18 +42,22 @@ from .learning_algs import (
 from .oracles import (
     BreadthFirstExplorationEqOracle,
     CacheBasedEqOracle,
+    HsiMethodEqOracle,
     KWayStateCoverageEqOracle,
     KWayTransitionCoverageEqOracle,
     PacOracle,
     PerfectKnowledgeEqOracle,
+    PortfolioEqOracle,
     ProvidedSequencesOracleWrapper,
     RandomWalkEqOracle,
     RandomWMethodEqOracle,
     RandomWordEqOracle,
+    RandomWpMethodEqOracle,
     StatePrefixEqOracle,
     TransitionFocusOracle,
     UserInputEqOracle,
     WMethodEqOracle,
+    WpMethodEqOracle,
     kWayStateCoverageEqOracle,
     kWayTransitionCoverageEqOracle,
 )
@@ -91,5 +95,6 @@ from .utils import (
     model_check_properties,
     save_automaton_to_file,
     statistical_model_checking,
+    trace_conformance,
     visualize_automaton,
 )
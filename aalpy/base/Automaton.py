@@ -2,6 +2,7 @@ import copy
 import warnings
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from itertools import chain
 from typing import Union, TypeVar, Generic, List
 
 
@@ -170,12 +171,239 @@ class Automaton(ABC, Generic[AutomatonStateType]):
         return self.from_state_setup, (self.to_state_setup(),)
 
 
+class CompiledAutomaton:
+    """
+    Integer-indexed transition and output tables of an input complete deterministic automaton. States and inputs
+    are encoded by their index in states and input_alphabet, and outputs by their index in output_alphabet.
+    Output of a transition is the output returned by the step method of the automaton, that is, the output of the
+    reached state in case of DFAs and Moore machines.
+    Sequences are executed on nested lists (transition_list and output_list) by run and run_many, whereas
+    execute_batch executes many integer-encoded sequences at once on transition_matrix and output_matrix, which are
+    NumPy arrays if NumPy is available (nested lists otherwise).
+    """
+
+    def __init__(self, automaton):
+        """
+        Args:
+
+            automaton (DeterministicAutomaton): input complete deterministic automaton
+
+        """
+        self.states = list(automaton.states)
+        self.input_alphabet = automaton.get_input_alphabet()
+        self.output_alphabet = []
+
+        self.state_index = {state: index for index, state in enumerate(self.states)}
+        self.input_index = {letter: index for index, letter in enumerate(self.input_alphabet)}
+        self.initial_state_index = self.state_index[automaton.initial_state]
+
+        self.output_index = dict()
+        # state index -> list of reached state indices/outputs, indexed by inputs
+        self.transition_list, self.output_list = [], []
+        state_save = automaton.current_state
+        for state in self.states:
+            reached_states, outputs = [], []
+            for letter in self.input_alphabet:
+                automaton.current_state = state
+                output = automaton.step(letter)
+                reached_states.append(self.state_index[automaton.current_state])
+                outputs.append(output)
+                if output not in self.output_index:
+                    self.output_index[output] = len(self.output_alphabet)
+                    self.output_alphabet.append(output)
+            self.transition_list.append(reached_states)
+            self.output_list.append(outputs)
+        automaton.current_state = state_save
+
+        # NumPy tables, created on first access
+        self._transition_matrix, self._output_matrix = None, None
+
+    def _create_matrices(self):
+        self._transition_matrix = self.transition_list
+        self._output_matrix = [[self.output_index[output] for output in outputs] for outputs in self.output_list]
+
+        from aalpy.utils.HelperFunctions import is_numpy_available
+        if is_numpy_available():
+            import numpy as np
+            shape = (len(self.states), len(self.input_alphabet))
+            self._transition_matrix = np.array(self._transition_matrix, dtype=np.int64).reshape(shape)
+            self._output_matrix = np.array(self._output_matrix, dtype=np.int64).reshape(shape)
+
+    @property
+    def transition_matrix(self):
+        """
+        Matrix of reached state indices, indexed by state and input indices.
+        """
+        if self._transition_matrix is None:
+            self._create_matrices()
+        return self._transition_matrix
+
+    @property
+    def output_matrix(self):
+        """
+        Matrix of output indices, indexed by state and input indices.
+        """
+        if self._output_matrix is None:
+            self._create_matrices()
+        return self._output_matrix
+
+    def step(self, state_index, letter):
+        """
+        Args:
+
+            state_index: index of the state from which the letter is executed
+            letter: input
+
+        Returns:
+
+            index of the reached state and the output of the transition
+
+        """
+        input_index = self.input_index[letter]
+        return self.transition_list[state_index][input_index], self.output_list[state_index][input_index]
+
+    def run(self, seq, state_index=None):
+        """
+        Computes the output response to an input sequence.
+
+        Args:
+
+            seq: input sequence
+            state_index: index of the state from which the sequence is executed, initial state if None
+
+        Returns:
+
+            list of outputs
+
+        """
+        state = self.initial_state_index if state_index is None else state_index
+        transitions, outputs, input_index = self.transition_list, self.output_list, self.input_index
+        output_seq = []
+        for letter in seq:
+            i = input_index[letter]
+            output_seq.append(outputs[state][i])
+            state = transitions[state][i]
+        return output_seq
+
+    def run_many(self, seqs, state_index=None):
+        """
+        Computes output responses to multiple input sequences. Outputs are returned as lists, for which executing
+        sequences one by one is faster than decoding outputs of execute_batch.
+
+        Args:
+
+            seqs: list of input sequences
+            state_index: index of the state from which sequences are executed, initial state if None
+
+        Returns:
+
+            list containing a list of outputs for each sequence
+
+        """
+        return [self.run(seq, state_index) for seq in seqs]
+
+    def encode_inputs(self, seqs):
+        """
+        Encodes input sequences as a 2-D NumPy array of input indices, where each row is padded with -1 to the length
+        of the longest sequence. Requires NumPy.
+
+        Args:
+
+            seqs: list of input sequences
+
+        Returns:
+
+            2-D array of input indices
+
+        """
+        import numpy as np
+
+        lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+        encoded_inputs = np.full((len(seqs), int(lengths.max(initial=0))), -1, dtype=np.int64)
+        encoded_inputs[np.arange(encoded_inputs.shape[1]) < lengths[:, None]] = np.fromiter(
+            map(self.input_index.__getitem__, chain.from_iterable(seqs)), dtype=np.int64, count=int(lengths.sum()))
+        return encoded_inputs
+
+    def execute_batch(self, encoded_inputs, state_index=None):
+        """
+        Executes all rows of a padded 2-D array of input indices (see encode_inputs) in lock-step, advancing all
+        sequences by one input at a time with NumPy lookups in the transition and output matrices. Rows may only be
+        padded (with negative values) at the end. Requires NumPy.
+
+        Args:
+
+            encoded_inputs: 2-D array of input indices
+            state_index: index of the state from which sequences are executed, initial state if None
+
+        Returns:
+
+            2-D array of output indices (indices in output_alphabet), -1 at padded positions
+
+        """
+        import numpy as np
+
+        encoded_inputs = np.asarray(encoded_inputs, dtype=np.int64)
+        num_rows, num_positions = encoded_inputs.shape
+        # rows are sorted by decreasing length, so that at each position only a prefix of rows is executed
+        lengths = (encoded_inputs >= 0).sum(axis=1)
+        order = np.argsort(-lengths, kind='stable')
+        num_active_rows = num_rows - np.searchsorted(lengths[order][::-1], np.arange(num_positions), side='right')
+        # position -> inputs of sorted rows
+        inputs = np.ascontiguousarray(encoded_inputs[order].T)
+
+        # transitions and outputs are looked up by state_index * number of inputs + input index
+        num_inputs = len(self.input_alphabet)
+        transitions, outputs = self.transition_matrix.ravel(), self.output_matrix.ravel()
+
+        state = self.initial_state_index if state_index is None else state_index
+        states = np.full(num_rows, state, dtype=np.int64)
+        sorted_outputs = np.full((num_positions, num_rows), -1, dtype=np.int64)
+        for position, active in enumerate(num_active_rows.tolist()):
+            transition_indices = states[:active] * num_inputs + inputs[position, :active]
+            sorted_outputs[position, :active] = outputs[transition_indices]
+            states[:active] = transitions[transition_indices]
+
+        encoded_outputs = np.empty_like(encoded_inputs)
+        encoded_outputs[order] = sorted_outputs.T
+        return encoded_outputs
+
+
 class DeterministicAutomaton(Automaton[AutomatonStateType]):
 
     @abstractmethod
     def step(self, letter):
         pass
 
+    def compile(self):
+        """
+        Compiles the automaton into integer-indexed transition and output tables, which can be used to compute output
+        responses without stepping through state objects. The automaton has to be input complete, and the compiled
+        automaton does not reflect later changes of the automaton.
+
+        Returns:
+
+            CompiledAutomaton
+
+        """
+        return CompiledAutomaton(self)
+
+    def execute_batch(self, encoded_inputs):
+        """
+        Executes many input sequences at once, given as a padded 2-D array of input indices of the compiled
+        automaton (see CompiledAutomaton.encode_inputs). All sequences are advanced in lock-step with NumPy lookups
+        in the compiled transition table. Requires NumPy and an input complete automaton.
+
+        Args:
+
+            encoded_inputs: 2-D array of input indices, padded with -1
+
+        Returns:
+
+            2-D array of output indices (indices in output_alphabet of the compiled automaton), -1 at padded positions
+
+        """
+        return self.compile().execute_batch(encoded_inputs)
+
     def get_shortest_path(self, origin_state: AutomatonStateType, target_state: AutomatonStateType) -> Union[
         tuple, None]:
         """
@@ -343,10 +571,12 @@ class DeterministicAutomaton(Automaton[AutomatonStateType]):
         """
         blocks = list()
         blocks.append(copy.copy(self.states))
+        # output responses are computed on compiled transition tables if possible
+        compiled = self.compile() if self.is_input_complete() else None
         char_set = [] if not char_set_init else char_set_init
         if char_set_init:
             for seq in char_set_init:
-                blocks = self._split_blocks(blocks, seq)
+                blocks = self._split_blocks(blocks, seq, compiled)
 
         alphabet = self.get_input_alphabet()
         while True:
@@ -387,13 +617,13 @@ class DeterministicAutomaton(Automaton[AutomatonStateType]):
                     if seq in char_set:
                         continue
                     char_set.append(seq)
-                    blocks = self._split_blocks(blocks, seq)
+                    blocks = self._split_blocks(blocks, seq, compiled)
             else:
                 blocks.remove(block_to_split)
                 new_blocks = [block_to_split]
                 for seq in dist_seq_closure:
                     char_set.append(seq)
-                    new_blocks = self._split_blocks(new_blocks, seq)
+                    new_blocks = self._split_blocks(new_blocks, seq, compiled)
                 for new_block in new_blocks:
                     blocks.append(new_block)
 
@@ -402,12 +632,13 @@ class DeterministicAutomaton(Automaton[AutomatonStateType]):
             return None, None
         return char_set
 
-    def _split_blocks(self, blocks, seq):
+    def _split_blocks(self, blocks, seq, compiled=None):
         """
         Refines a partition of states (blocks) using the output response to a given input sequence seq.
         Args:
             blocks: a partition of states
             seq: an input sequence
+            compiled: compiled automaton used to compute output responses to non-empty sequences, if given
 
         Returns: a refined partition of states
 
@@ -416,7 +647,10 @@ class DeterministicAutomaton(Automaton[AutomatonStateType]):
         for block in blocks:
             block_after_split = defaultdict(list)
             for state in block:
-                output_seq = tuple(self.compute_output_seq(state, seq))
+                if compiled is not None and seq:
+                    output_seq = tuple(compiled.run(seq, compiled.state_index[state]))
+                else:
+                    output_seq = tuple(self.compute_output_seq(state, seq))
                 block_after_split[output_seq].append(state)
             for new_block in block_after_split.values():
                 new_blocks.append(new_block)
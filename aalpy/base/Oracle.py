@@ -1,12 +1,16 @@
+import warnings
 from abc import ABC, abstractmethod
+from itertools import islice
 
 from aalpy.base import SUL
+from aalpy.base.Automaton import DeterministicAutomaton
+from aalpy.base.SUL import CacheSUL
 
 
 class Oracle(ABC):
     """Abstract class implemented by all equivalence oracles."""
 
-    def __init__(self, alphabet: list, sul: SUL):
+    def __init__(self, alphabet: list, sul: SUL, num_processes=1):
         """
         Default constructor for all equivalence oracles.
 
@@ -14,10 +18,15 @@ class Oracle(ABC):
 
             alphabet: input alphabet
             sul: system under learning
+            num_processes: number of processes in which test cases passed to execute_test_suite are executed, each
+                process executes them on its own replica of the SUL. If the SUL is a CacheSUL (e.g. when learning
+                with cache_and_non_det_check), the processes execute test cases on replicas of the wrapped SUL, so
+                their queries are neither answered from nor added to the cache
         """
 
         self.alphabet = alphabet
         self.sul = sul
+        self.num_processes = num_processes
         self.num_queries = 0
         self.num_steps = 0
 
@@ -49,4 +58,224 @@ class Oracle(ABC):
         hypothesis.reset_to_initial()
         self.sul.post()
         self.sul.pre()
-        self.num_queries += 1
\ No newline at end of file
+        self.num_queries += 1
+
+
+    def execute_test_suite(self, hypothesis, test_suite, batch_size=10000):
+        """
+        Executes test cases on the SUL and the hypothesis and returns the first counterexample that is found.
+        Test cases are taken from the iterable in batches and each batch is stored in a prefix tree, which is
+        traversed in depth-first order. Test cases that are prefixes of other test cases (or duplicates) are
+        therefore not executed separately, and the hypothesis is stepped only once per edge of the tree. The SUL is
+        reset only when the traversal backtracks, after which the prefix shared with the previous test case is
+        re-executed on the SUL.
+
+        If the oracle was created with num_processes greater than 1 and the hypothesis is deterministic, test cases
+        are executed in parallel on replicas of the SUL (see _execute_test_suite_in_parallel).
+
+        Args:
+
+            hypothesis: current hypothesis
+
+            test_suite: iterable of test cases (tuples of inputs)
+
+            batch_size: number of test cases stored in a prefix tree at once
+
+        Returns:
+
+            counterexample inputs, None if no counterexample is found
+        """
+        # input complete deterministic hypotheses are simulated on their compiled transition tables
+        compiled_hypothesis = None
+        if isinstance(hypothesis, DeterministicAutomaton) and hypothesis.is_input_complete():
+            compiled_hypothesis = hypothesis.compile()
+
+        if self.num_processes > 1 and isinstance(hypothesis, DeterministicAutomaton):
+            return self._execute_test_suite_in_parallel(hypothesis, test_suite, min(batch_size, max_chunk_size),
+                                                        compiled_hypothesis)
+
+        test_suite = iter(test_suite)
+        while True:
+            batch = list(islice(test_suite, batch_size))
+            if not batch:
+                return None
+
+            cex, num_steps, num_queries = _execute_prefix_tree(self.sul, hypothesis, _create_prefix_tree(batch),
+                                                               compiled_hypothesis)
+            self.num_steps += num_steps
+            self.num_queries += num_queries
+            if cex is not None:
+                return cex
+
+    def _execute_test_suite_in_parallel(self, hypothesis, test_suite, chunk_size, compiled_hypothesis=None):
+        """
+        Executes test cases in num_processes processes, each of which holds its own replica of the SUL (if the SUL
+        is a CacheSUL, the wrapped SUL is replicated and queries executed by the processes are not cached).
+        Test cases are sent to the processes in chunks of chunk_size, each chunk is executed through a prefix tree.
+        As soon as any chunk yields a counterexample, outstanding chunks are cancelled and the shortest
+        counterexample among the finished chunks is returned.
+
+        Args:
+
+            hypothesis: current hypothesis
+
+            test_suite: iterable of test cases (tuples of inputs)
+
+            chunk_size: number of test cases executed by a process at once
+
+            compiled_hypothesis: compiled hypothesis, if the hypothesis is input complete
+
+        Returns:
+
+            shortest counterexample found, None if no counterexample is found
+        """
+        from multiprocessing import Pool
+        from queue import Queue
+
+        sul = self.sul
+        if isinstance(sul, CacheSUL):
+            warnings.warn('Test cases executed in parallel bypass the cache of the CacheSUL.')
+            sul = sul.sul
+        # results of finished chunks, put by the result handler thread of the pool
+        results = Queue()
+        counterexamples = []
+        num_pending = 0
+
+        test_suite = iter(test_suite)
+        pool = Pool(self.num_processes, initializer=_init_oracle_worker,
+                    initargs=(sul, hypothesis, compiled_hypothesis))
+        try:
+            while True:
+                # generate test cases lazily, keeping two chunks per process in flight
+                while not counterexamples and num_pending < 2 * self.num_processes:
+                    chunk = list(islice(test_suite, chunk_size))
+                    if not chunk:
+                        break
+                    pool.apply_async(_execute_test_cases, (chunk,), callback=results.put,
+                                     error_callback=results.put)
+                    num_pending += 1
+
+                if num_pending == 0:
+                    break
+
+                result = results.get()
+                num_pending -= 1
+                if isinstance(result, BaseException):
+                    raise result
+
+                cex, num_steps, num_queries = result
+                self.num_steps += num_steps
+                self.num_queries += num_queries
+                if cex is not None:
+                    counterexamples.append(cex)
+                # once a counterexample is found, only chunks that have already finished are considered
+                if counterexamples and results.empty():
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return min(counterexamples, key=len) if counterexamples else None
+
+
+# maximum number of test cases sent to a process at once by the parallel oracle execution
+max_chunk_size = 25
+
+_worker_sul = None
+_worker_hypothesis = None
+_worker_compiled_hypothesis = None
+
+
+def _init_oracle_worker(sul, hypothesis, compiled_hypothesis):
+    global _worker_sul, _worker_hypothesis, _worker_compiled_hypothesis
+    _worker_sul = sul
+    _worker_hypothesis = hypothesis
+    _worker_compiled_hypothesis = compiled_hypothesis
+
+
+def _execute_test_cases(test_cases):
+    return _execute_prefix_tree(_worker_sul, _worker_hypothesis, _create_prefix_tree(test_cases),
+                                _worker_compiled_hypothesis)
+
+
+def _create_prefix_tree(test_cases):
+    # prefix tree encoded as nested dictionaries, input -> subtree
+    root = dict()
+    for test_case in test_cases:
+        node = root
+        for letter in test_case:
+            node = node.setdefault(letter, dict())
+    return root
+
+
+def _execute_prefix_tree(sul, hypothesis, root, compiled_hypothesis=None):
+    """
+    Traverses the prefix tree in depth-first order, executing its edges on the SUL and the hypothesis.
+
+    Args:
+
+        sul: system under learning
+        hypothesis: current hypothesis
+        root: root of the prefix tree
+        compiled_hypothesis: compiled hypothesis, if the hypothesis is input complete
+
+    Returns:
+
+        counterexample inputs (None if no counterexample is found), number of executed steps and number of queries
+
+    """
+    num_steps, num_queries = 0, 0
+    path = []
+    # hypothesis states (or state indices of the compiled hypothesis) reached by prefixes of the path
+    if compiled_hypothesis is not None:
+        transitions, outputs = compiled_hypothesis.transition_list, compiled_hypothesis.output_list
+        input_index = compiled_hypothesis.input_index
+        hyp_states = [compiled_hypothesis.initial_state_index]
+    else:
+        hyp_states = [hypothesis.initial_state]
+    # length of the prefix of the path that was executed on the SUL since the last reset
+    sul_depth = -1
+    stack = [iter(root.items())]
+
+    while stack:
+        edge = next(stack[-1], None)
+        if edge is None:
+            stack.pop()
+            if path:
+                path.pop()
+                hyp_states.pop()
+            continue
+
+        letter, child = edge
+        if sul_depth != len(path):
+            hypothesis.reset_to_initial()
+            sul.post()
+            sul.pre()
+            num_queries += 1
+            for inp in path:
+                sul.step(inp)
+            num_steps += len(path)
+            sul_depth = len(path)
+
+        if compiled_hypothesis is not None:
+            hyp_state, letter_index = hyp_states[-1], input_index[letter]
+            out_hyp = outputs[hyp_state][letter_index]
+            hyp_state = transitions[hyp_state][letter_index]
+        else:
+            hypothesis.current_state = hyp_states[-1]
+            out_hyp = hypothesis.step(letter)
+            hyp_state = hypothesis.current_state
+        out_sul = sul.step(letter)
+        num_steps += 1
+
+        path.append(letter)
+        hyp_states.append(hyp_state)
+        sul_depth += 1
+
+        if out_hyp != out_sul:
+            sul.post()
+            return tuple(path), num_steps, num_queries
+
+        stack.append(iter(child.items()))
+
+    return None, num_steps, num_queries
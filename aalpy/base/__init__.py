@@ -1,3 +1,3 @@
-from .Automaton import Automaton, AutomatonState, DeterministicAutomaton
+from .Automaton import Automaton, AutomatonState, CompiledAutomaton, DeterministicAutomaton
 from .Oracle import Oracle
 from .SUL import SUL
@@ -1,15 +1,36 @@
 import queue
 import time
+from collections import defaultdict
 
 from aalpy.learning_algs.deterministic_passive.rpni_helper_functions import to_automaton, RpniNode, createPTA
 
 
 class GeneralizedStateMerging:
-    def __init__(self, data, automaton_type, print_info=True):
+    def __init__(self, data, automaton_type, print_info=True, merging_strategy='first', candidate_window=None):
+        """
+        Args:
+
+            data: sequence of input sequences and corresponding label
+            automaton_type: either 'dfa', 'mealy', 'moore'
+            print_info: print learning progress and runtime information
+            merging_strategy: either 'first' (merge the minimal blue state with the first compatible red state) or
+                'edsm' (evidence-driven state merging, blue-fringe merge with the highest evidence score is performed)
+            candidate_window: if merging_strategy is 'edsm', only the candidate_window minimal blue states are scored
+                in each round. If None, all blue states are scored.
+        """
+        assert merging_strategy in {'first', 'edsm'}
+        assert candidate_window is None or candidate_window > 0
+
         self.data = data
         self.final_automaton_type = automaton_type
         self.automaton_type = automaton_type if automaton_type != 'dfa' else 'moore'
         self.print_info = print_info
+        self.merging_strategy = merging_strategy
+        self.candidate_window = candidate_window
+
+        # EDSM score cache, (red, blue) -> score (None if not compatible), and nodes each cached score depends on
+        self._score_cache = dict()
+        self._score_dependencies = defaultdict(set)
 
         pta_construction_start = time.time()
         self.root = createPTA(data, self.automaton_type)
@@ -27,14 +48,17 @@ class GeneralizedStateMerging:
         blue_states = list(red_states[0].children.values())
 
         while blue_states:
-            blue_state = min(list(blue_states))
+            if self.merging_strategy == 'edsm':
+                blue_state, red_state, partition = self._select_edsm_merge(red_states, blue_states)
+            else:
+                blue_state = min(list(blue_states))
 
-            partition = None
-            red_state = None
-            for red_state in red_states:
-                partition = self._partition_from_merge(red_state, blue_state)
-                if partition is not None:
-                    break
+                partition = None
+                red_state = None
+                for red_state in red_states:
+                    partition = self._partition_from_merge(red_state, blue_state)
+                    if partition is not None:
+                        break
 
             if partition is None:
                 self.log.append(["promote", (blue_state.prefix,)])
@@ -44,34 +68,124 @@ class GeneralizedStateMerging:
             else:
                 self.log.append(["merge", (red_state.prefix, blue_state.prefix)])
 
+                # nodes whose output or children are changed by the merge
+                changed_nodes = []
+
                 # use the partition for merging
                 for node in partition.keys():
                     block = partition[node]
                     # assert RpniNode.compatible(node, block)
+                    if not self._same_content(node, block):
+                        changed_nodes.append(node)
                     node.output = block.output
                     node.children = block.children
 
                 node = self.root.get_child_by_prefix(blue_state.prefix[:-1])
                 node.children[blue_state.prefix[-1]] = red_state
+                changed_nodes.append(node)
+
+                if self.merging_strategy == 'edsm':
+                    self._invalidate_scores(changed_nodes)
 
+            previous_blue_states = set(blue_states)
             blue_states.clear()
             for r in red_states:
                 for c in r.children.values():
                     if c not in red_states:
                         blue_states.append(c)
 
+            if self.merging_strategy == 'edsm':
+                # scores of states that left the blue fringe (merged, promoted or no longer reachable) are not needed
+                for state in previous_blue_states.difference(blue_states):
+                    self._invalidate_keys([(red, state) for red in red_states])
+
         if self.print_info:
             print(f'\nRPNI-GSM Learning Time: {round(time.time() - start_time, 2)}')
             print(f'RPNI-GSM Learned {len(red_states)} state automaton.')
 
         return to_automaton(red_states, self.final_automaton_type)
 
+    def _select_edsm_merge(self, red_states, blue_states):
+        """
+        Blue-fringe selection of the next merge. If a blue state is not compatible with any red state, it is returned
+        for promotion. Otherwise, the (red, blue) pair with the highest evidence score is returned with its partition.
+        """
+        candidates = sorted(blue_states)
+        if self.candidate_window is not None:
+            candidates = candidates[:self.candidate_window]
+
+        best_score, best_pair = -1, None
+        for blue_state in candidates:
+            compatible_red_found = False
+            for red_state in red_states:
+                score = self._get_score(red_state, blue_state)
+                if score is None:
+                    continue
+                compatible_red_found = True
+                if score > best_score:
+                    best_score, best_pair = score, (red_state, blue_state)
+
+            if not compatible_red_found:
+                return blue_state, None, None
+
+        red_state, blue_state = best_pair
+        return blue_state, red_state, self._partition_from_merge(red_state, blue_state)
+
+    def _get_score(self, red, blue):
+        """
+        Returns the cached evidence score of merging blue into red. A score is only recomputed if the output or the
+        children of one of the nodes visited during its computation were changed by a merge.
+        """
+        key = (red, blue)
+        if key not in self._score_cache:
+            partitions, score, visited = self._compute_merge(red, blue)
+            self._score_cache[key] = (score if partitions is not None else None, visited)
+            for node in visited:
+                self._score_dependencies[node].add(key)
+        return self._score_cache[key][0]
+
+    def _invalidate_scores(self, changed_nodes):
+        for node in changed_nodes:
+            self._invalidate_keys(list(self._score_dependencies.get(node, ())))
+
+    def _invalidate_keys(self, keys):
+        for key in keys:
+            if key not in self._score_cache:
+                continue
+            _, visited = self._score_cache.pop(key)
+            # remove the key from dependency sets of all nodes it depended on
+            for node in visited:
+                dependencies = self._score_dependencies[node]
+                dependencies.discard(key)
+                if not dependencies:
+                    del self._score_dependencies[node]
+
+    @staticmethod
+    def _same_content(node: RpniNode, block: RpniNode):
+        if node.output != block.output or len(node.children) != len(block.children):
+            return False
+        return all(symbol in node.children and node.children[symbol] is child
+                   for symbol, child in block.children.items())
+
     def _partition_from_merge(self, red: RpniNode, blue: RpniNode):
         """
         Compatibility check based on partitions
         """
+        return self._compute_merge(red, blue)[0]
+
+    def _compute_merge(self, red: RpniNode, blue: RpniNode):
+        """
+        Computes the partition resulting from merging blue into red.
+
+        Returns:
+
+            tuple (partitions, score, visited), where partitions is None if the merge is not compatible, score is the
+            number of concrete outputs confirmed by the merge (EDSM evidence), and visited contains all nodes the
+            result depends on
+        """
 
         partitions = dict()
+        score = 0
         q = queue.Queue()
         q.put((red, blue))
 
@@ -89,12 +203,18 @@ class GeneralizedStateMerging:
             partition = get_partition(red)
 
             if not RpniNode.compatible_outputs(partition, blue):
-                return None
-            if self.automaton_type == 'moore' and partition.output is None:
-                partition.output = blue.output
+                return None, score, list(partitions.keys()) + [blue]
+            if self.automaton_type == 'moore':
+                if partition.output is None:
+                    partition.output = blue.output
+                elif blue.output is not None:
+                    score += 1
             if self.automaton_type == 'mealy':
-                for key in filter(lambda k: k not in partition.output or partition.output[k] is None, blue.output):
-                    partition.output[key] = blue.output[key]
+                for key in blue.output:
+                    if key not in partition.output or partition.output[key] is None:
+                        partition.output[key] = blue.output[key]
+                    elif blue.output[key] is not None:
+                        score += 1
 
             partitions[blue] = partition
 
@@ -104,4 +224,4 @@ class GeneralizedStateMerging:
                 else:
                     # blue_child is blue after merging if there is a red state in the partition
                     partition.children[symbol] = blue_child
-        return partitions
+        return partitions, score, list(partitions.keys())
@@ -1,5 +1,6 @@
 import time
 from bisect import insort
+from collections import defaultdict
 from typing import Union
 
 from aalpy.base import DeterministicAutomaton
@@ -16,7 +17,16 @@ class RPNI:
 
         pta_construction_start = time.time()
         self.root_node = createPTA(data, automaton_type)
-        self.test_data = extract_unique_sequences(self.root_node)
+        self.test_data = extract_unique_sequences(self.root_node) if self.root_node is not None else []
+
+        # for each node, indices of test sequences passing through it in the current model
+        self.trace_index = defaultdict(set)
+        # nodes visited by each test sequence in the current model
+        self.trace_paths = [None] * len(self.test_data)
+        # sequences not valid in the current model, they are replayed on every compatibility check
+        self.invalid_sequences = set()
+        for seq_index, sequence in enumerate(self.test_data):
+            self._index_sequence(seq_index, sequence)
 
         if self.print_info:
             print(f'PTA Construction Time: {round(time.time() - pta_construction_start, 2)}')
@@ -33,11 +43,16 @@ class RPNI:
             for red_state in red:
                 if not red_state.compatible_outputs(lex_min_blue):
                     continue
-                merge_candidate = self._merge(red_state, lex_min_blue, copy_nodes=True)
-                if self._compatible(merge_candidate):
-                    self._merge(red_state, lex_min_blue)
+                # id(node) -> (node, output, children) before the merge, for all nodes changed by the merge
+                undo_log = dict()
+                self._merge(red_state, lex_min_blue, undo_log)
+                affected_sequences = self._compatible(undo_log)
+                if affected_sequences is not None:
+                    for seq_index in affected_sequences:
+                        self._index_sequence(seq_index, self.test_data[seq_index])
                     merged = True
                     break
+                self._undo_merge(undo_log)
 
             if not merged:
                 insort(red, lex_min_blue)
@@ -57,50 +72,84 @@ class RPNI:
         assert sorted(red, key=lambda x: len(x.prefix)) == red
         return to_automaton(red, self.automaton_type)
 
-    def _compatible(self, root_node):
+    def _compatible(self, changed_nodes):
         """
-        Check if current model is compatible with the data.
+        Check if current model is compatible with the data. Only sequences passing through nodes changed by the last
+        merge are replayed, as all other sequences traverse unchanged nodes.
+
+        Returns:
+
+            indices of replayed sequences if the model is compatible with the data, None otherwise
         """
-        for sequence in self.test_data:
-            if not check_sequence(root_node, sequence, automaton_type=self.automaton_type):
-                return False
-        return True
+        affected_sequences = set(self.invalid_sequences)
+        for node, _, _ in changed_nodes.values():
+            affected_sequences.update(self.trace_index.get(node, ()))
 
-    def _merge(self, red_node, lex_min_blue, copy_nodes=False):
+        for seq_index in affected_sequences:
+            if not check_sequence(self.root_node, self.test_data[seq_index], automaton_type=self.automaton_type):
+                return None
+        return affected_sequences
+
+    def _index_sequence(self, seq_index, sequence):
         """
-        Merge two states and return the root node of resulting model.
+        (Re)computes the nodes visited by the sequence and updates the trace index.
         """
-        root_node = self.root_node.copy() if copy_nodes else self.root_node
-        lex_min_blue = lex_min_blue.copy() if copy_nodes else lex_min_blue
-
-        red_node_in_tree = root_node
-        for p in red_node.prefix:
-            red_node_in_tree = red_node_in_tree.children[p]
+        if self.trace_paths[seq_index] is not None:
+            for node in self.trace_paths[seq_index]:
+                self.trace_index[node].discard(seq_index)
+                if not self.trace_index[node]:
+                    del self.trace_index[node]
+
+        visited_nodes = []
+        if check_sequence(self.root_node, sequence, self.automaton_type, visited_nodes):
+            self.invalid_sequences.discard(seq_index)
+        else:
+            self.invalid_sequences.add(seq_index)
+        self.trace_paths[seq_index] = visited_nodes
+        for node in visited_nodes:
+            self.trace_index[node].add(seq_index)
 
-        to_update = root_node
-        for p in lex_min_blue.prefix[:-1]:
-            to_update = to_update.children[p]
+    def _merge(self, red_node, lex_min_blue, undo_log):
+        """
+        Merge two states in place. Original output and children of all changed nodes are appended to the undo log.
+        """
+        red_node_in_tree = self.root_node.get_child_by_prefix(red_node.prefix)
+        to_update = self.root_node.get_child_by_prefix(lex_min_blue.prefix[:-1])
 
+        self._log_change(to_update, undo_log)
         to_update.children[lex_min_blue.prefix[-1]] = red_node_in_tree
 
         if self.automaton_type != 'mealy':
-            self._fold(red_node_in_tree, lex_min_blue)
+            self._fold(red_node_in_tree, lex_min_blue, undo_log)
         else:
-            self._fold_mealy(red_node_in_tree, lex_min_blue)
+            self._fold_mealy(red_node_in_tree, lex_min_blue, undo_log)
+
+    @staticmethod
+    def _log_change(node, undo_log):
+        # each node is logged only before its first change, so that undoing restores the state before the merge
+        if id(node) not in undo_log:
+            undo_log[id(node)] = (node, node.output, dict(node.children))
 
-        return root_node
+    @staticmethod
+    def _undo_merge(undo_log):
+        for node, output, children in undo_log.values():
+            node.output = output
+            node.children = children
 
-    def _fold(self, red_node, blue_node):
+    def _fold(self, red_node, blue_node, undo_log):
         # Change the output of red only to concrete output, ignore None
-        red_node.output = blue_node.output if blue_node.output is not None else red_node.output
+        if blue_node.output is not None and blue_node.output != red_node.output:
+            self._log_change(red_node, undo_log)
+            red_node.output = blue_node.output
 
         for i in blue_node.children.keys():
             if i in red_node.children.keys():
-                self._fold(red_node.children[i], blue_node.children[i])
+                self._fold(red_node.children[i], blue_node.children[i], undo_log)
             else:
+                self._log_change(red_node, undo_log)
                 red_node.children[i] = blue_node.children[i]
 
-    def _fold_mealy(self, red_node, blue_node):
+    def _fold_mealy(self, red_node, blue_node, undo_log):
         blue_io_map = {i: o for i, o in blue_node.children.keys()}
 
         updated_keys = {}
@@ -108,17 +157,20 @@ class RPNI:
             o = blue_io_map[io[0]] if io[0] in blue_io_map.keys() else io[1]
             updated_keys[(io[0], o)] = val
 
-        red_node.children = updated_keys
+        if updated_keys.keys() != red_node.children.keys():
+            self._log_change(red_node, undo_log)
+            red_node.children = updated_keys
 
         for io in blue_node.children.keys():
             if io in red_node.children.keys():
-                self._fold_mealy(red_node.children[io], blue_node.children[io])
+                self._fold_mealy(red_node.children[io], blue_node.children[io], undo_log)
             else:
+                self._log_change(red_node, undo_log)
                 red_node.children[io] = blue_node.children[io]
 
 
 def run_RPNI(data, automaton_type, algorithm='gsm',
-             input_completeness=None, print_info=True) -> Union[DeterministicAutomaton, None]:
+             input_completeness=None, print_info=True, candidate_window=None) -> Union[DeterministicAutomaton, None]:
     """
     Run RPNI, a deterministic passive model learning algorithm.
     Resulting model conforms to the provided data.
@@ -127,19 +179,24 @@ def run_RPNI(data, automaton_type, algorithm='gsm',
 
     Args:
 
-        data: sequence of input sequences and corresponding label. Eg. [[(i1,i2,i3, ...), label], ...]
+        data: sequence of input sequences and corresponding label. Eg. [[(i1,i2,i3, ...), label], ...], or
+        integer-encoded input sequences and labels as EncodedTraces
         automaton_type: either 'dfa', 'mealy', 'moore'. Note that for 'mealy' machine learning, data has to be prefix-closed.
-        algorithm: either 'gsm' (generalized state merging) or 'classic' for base RPNI implementation. GSM is much faster and less resource intensive.
+        algorithm: either 'gsm' (generalized state merging), 'edsm' (generalized state merging with evidence-driven
+        blue-fringe merge selection) or 'classic' for base RPNI implementation. GSM is much faster and less resource
+        intensive. EDSM usually leads to smaller models on noisy or sparse data.
         input_completeness: either None, 'sink_state', or 'self_loop'. If None, learned model could be input incomplete,
         sink_state will lead all undefined inputs form some state to the sink state, whereas self_loop will simply create
         a self loop. In case of Mealy learning output of the added transition will be 'epsilon'.
         print_info: print learning progress and runtime information
+        candidate_window: only used if algorithm is 'edsm'. If set, only the candidate_window minimal blue states are
+        scored in each merging round. If None, all blue states are scored.
 
     Returns:
 
         Model conforming to the data, or None if data is non-deterministic.
     """
-    assert algorithm in {'gsm', 'classic'}
+    assert algorithm in {'gsm', 'edsm', 'classic'}
     assert automaton_type in {'dfa', 'mealy', 'moore'}
     assert input_completeness in {None, 'self_loop', 'sink_state'}
 
@@ -151,7 +208,9 @@ def run_RPNI(data, automaton_type, algorithm='gsm',
                   'or consider using Alergia.')
             return None
     else:
-        rpni = GeneralizedStateMerging(data, automaton_type, print_info)
+        merging_strategy = 'edsm' if algorithm == 'edsm' else 'first'
+        rpni = GeneralizedStateMerging(data, automaton_type, print_info, merging_strategy=merging_strategy,
+                                       candidate_window=candidate_window)
 
         if rpni.root is None:
             print('Data provided to RPNI is not deterministic. Ensure that the data is deterministic, '
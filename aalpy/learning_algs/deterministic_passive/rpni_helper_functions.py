@@ -1,6 +1,8 @@
 import pickle
 from functools import total_ordering
 
+from aalpy.utils.DataHandler import EncodedTraces
+
 
 @total_ordering
 class RpniNode:
@@ -52,11 +54,14 @@ class RpniNode:
         return node
 
 
-def check_sequence(root_node, seq, automaton_type):
+def check_sequence(root_node, seq, automaton_type, visited_nodes=None):
     """
     Checks whether each sequence in the dataset is valid in the current automaton.
+    If visited_nodes list is passed, all nodes traversed by the sequence are appended to it.
     """
     curr_node = root_node
+    if visited_nodes is not None:
+        visited_nodes.append(curr_node)
     for i, o in seq:
         if automaton_type == 'mealy':
             input_outputs = {i: o for i, o in curr_node.children.keys()}
@@ -68,11 +73,16 @@ def check_sequence(root_node, seq, automaton_type):
             curr_node = curr_node.children[i]
             if o is not None and curr_node.output != o:
                 return False
+        if visited_nodes is not None:
+            visited_nodes.append(curr_node)
     return True
 
 
 def createPTA(data, automaton_type):
-    data.sort(key=lambda x: len(x[0]))
+    if isinstance(data, EncodedTraces):
+        data = data.rpni_sequences()
+    else:
+        data.sort(key=lambda x: len(x[0]))
 
     root_node = RpniNode(automaton_type=automaton_type)
     for seq, label in data:
@@ -9,7 +9,7 @@ print_options = [0, 1, 2, 3]
 
 
 def run_abstracted_ONFSM_Lstar(alphabet: list, sul: SUL, eq_oracle: Oracle, abstraction_mapping: dict, n_sampling=100,
-                               max_learning_rounds=None, return_data=False, print_level=2):
+                               max_learning_rounds=None, return_data=False, print_level=2, sampling_confidence=None):
     """
     Based on ''Learning Abstracted Non-deterministic Finite State Machines'' from Pferscher and Aichernig.
     The algorithm learns an abstracted onfsm of a non-deterministic system. For the additional abstraction,
@@ -40,6 +40,10 @@ def run_abstracted_ONFSM_Lstar(alphabet: list, sul: SUL, eq_oracle: Oracle, abst
         print_level: 0 - None, 1 - just results, 2 - current round and hypothesis size, 3 - educational/debug
             (Default value = 2)
 
+        sampling_confidence: if set, e.g. to 0.98, sampling is adaptive and n_sampling is the maximum number of
+            samples per cell. A cell is sampled until the estimated probability of observing a new output in it is at
+            most 1 - sampling_confidence, which saves samples in deterministic parts of the system (Default value = None)
+
     Returns:
         learned abstracted ONFSM
 
@@ -52,7 +56,8 @@ def run_abstracted_ONFSM_Lstar(alphabet: list, sul: SUL, eq_oracle: Oracle, abst
     sul = NonDeterministicSULWrapper(sul)
     eq_oracle.sul = sul
 
-    abstracted_observation_table = AbstractedNonDetObservationTable(alphabet, sul, abstraction_mapping, n_sampling)
+    abstracted_observation_table = AbstractedNonDetObservationTable(alphabet, sul, abstraction_mapping, n_sampling,
+                                                                    sampling_confidence)
 
     # We fist query the initial row. Then based on output in its cells, we generate new rows in S.A,
     # and then we perform membership/input queries for them.
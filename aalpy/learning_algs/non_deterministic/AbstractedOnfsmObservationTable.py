@@ -7,7 +7,8 @@ from aalpy.utils.HelperFunctions import all_suffixes, extend_set
 
 
 class AbstractedNonDetObservationTable:
-    def __init__(self, alphabet: list, sul: NonDeterministicSULWrapper, abstraction_mapping: dict, n_sampling=100):
+    def __init__(self, alphabet: list, sul: NonDeterministicSULWrapper, abstraction_mapping: dict, n_sampling=100,
+                 sampling_confidence=None):
         """
         Construction of the abstracted non-deterministic observation table.
 
@@ -17,11 +18,12 @@ class AbstractedNonDetObservationTable:
             sul: system under learning
             abstraction_mapping: map that translates outputs to abstracted outputs
             n_sampling: number of samples to be performed for each cell
+            sampling_confidence: if set, cells are sampled adaptively, see NonDetObservationTable.is_cell_sampled
         """
 
         assert alphabet is not None and sul is not None
 
-        self.observation_table = NonDetObservationTable(alphabet, sul, n_sampling)
+        self.observation_table = NonDetObservationTable(alphabet, sul, n_sampling, sampling_confidence)
 
         self.S = list()
         self.S_dot_A = []
@@ -32,6 +34,16 @@ class AbstractedNonDetObservationTable:
         self.abstraction_mapping = abstraction_mapping
         self.sul = sul
 
+        # concrete output trace -> abstracted output trace
+        self.abstraction_cache = dict()
+        # row prefix -> node of the trace tree reached by it, nodes are never removed from the tree
+        self.row_nodes = dict()
+        # (row prefix, e) -> version of the row node when the cell was abstracted, concrete outputs of the cell only
+        # change if nodes were added below the row node
+        self.abstracted_cells = dict()
+        # row prefix -> hashable row over the first columns of E, removed when a cell of the row changes
+        self.row_cache = dict()
+
         empty_word = tuple()
         self.S.append((empty_word, empty_word))
 
@@ -67,15 +79,23 @@ class AbstractedNonDetObservationTable:
         update_E = self.E
 
         for s in update_S:
+            node = self.row_nodes.get(s)
+            if node is None:
+                node = self.sul.cache.get_to_node(s[0], s[1])
+                # rows that are not in the cache have no outputs to abstract
+                if node is None:
+                    continue
+                self.row_nodes[s] = node
             for e in update_E:
+                if self.abstracted_cells.get((s, e)) == node.version:
+                    continue
                 for o_tup in self.get_all_outputs(s, e):
-                    abstracted_outputs = []
-                    o_tup = tuple([o_tup])
-                    for outputs in o_tup:
-                        for o in outputs:
-                            abstract_output = self.get_abstraction(o)
-                            abstracted_outputs.append(abstract_output)
-                    self.add_to_T(s, e, tuple(abstracted_outputs))
+                    abstracted_outputs = self.abstraction_cache.get(o_tup)
+                    if abstracted_outputs is None:
+                        abstracted_outputs = tuple(self.get_abstraction(o) for o in o_tup)
+                        self.abstraction_cache[o_tup] = abstracted_outputs
+                    self.add_to_T(s, e, abstracted_outputs)
+                self.abstracted_cells[(s, e)] = node.version
 
     def add_to_T(self, s, e, value):
         """
@@ -91,7 +111,9 @@ class AbstractedNonDetObservationTable:
         """
         if e not in self.T[s]:
             self.T[s][e] = set()
-        self.T[s][e].add(value)
+        if value not in self.T[s][e]:
+            self.T[s][e].add(value)
+            self.row_cache.pop(s, None)
 
     # CHANGED
     # helper function
@@ -249,8 +271,10 @@ class AbstractedNonDetObservationTable:
         for s in tmp_S:
             hashed_s_row = self.row_to_hashable(s)
             if hashed_s_row in hashed_rows_from_s:
+                # S is usually the same list as S of the concrete observation table
                 if s in self.S:
                     self.S.remove(s)
+                if s in self.observation_table.S:
                     self.observation_table.S.remove(s)
                 size = len(s[0])
                 for row_prefix in tmp_both_S:
@@ -258,7 +282,8 @@ class AbstractedNonDetObservationTable:
                     if s != row_prefix and s == s_both_row:
                         if row_prefix in self.S:
                             self.S.remove(row_prefix)
-                            self.observation_table.S.remove(s)
+                        if row_prefix in self.observation_table.S:
+                            self.observation_table.S.remove(row_prefix)
             else:
                 hashed_rows_from_s.add(hashed_s_row)
 
@@ -276,10 +301,12 @@ class AbstractedNonDetObservationTable:
             hashable representation of the row
 
         """
-        row_repr = tuple()
-        for e in self.E:
+        # E is only extended, so only cells of new columns are added to a cached row
+        row_repr = self.row_cache.get(row_prefix, tuple())
+        for e in self.E[len(row_repr):]:
             # if e in self.T[row_prefix].keys():
             row_repr += (frozenset(self.T[row_prefix][e]),)
+        self.row_cache[row_prefix] = row_repr
         return row_repr
 
     def gen_hypothesis(self) -> Onfsm:
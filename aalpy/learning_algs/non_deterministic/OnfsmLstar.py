@@ -12,7 +12,7 @@ available_oracles, available_oracles_error_msg = get_available_oracles_and_err_m
 
 
 def run_non_det_Lstar(alphabet: list, sul: SUL, eq_oracle: Oracle, n_sampling=5, samples=None, stochastic=False,
-                      max_learning_rounds=None, return_data=False, print_level=2):
+                      max_learning_rounds=None, return_data=False, print_level=2, sampling_confidence=None):
     """
     A ONFSM learning algorithm that does not rely on all weather assumption (once an input is queried, all possible
     outputs are observed).
@@ -41,6 +41,10 @@ def run_non_det_Lstar(alphabet: list, sul: SUL, eq_oracle: Oracle, n_sampling=5,
         print_level: 0 - None, 1 - just results, 2 - current round and hypothesis size, 3 - educational/debug
             (Default value = 2)
 
+        sampling_confidence: if set, e.g. to 0.98, sampling is adaptive and n_sampling is the maximum number of
+            samples per cell. A cell is sampled until the estimated probability of observing a new output in it is at
+            most 1 - sampling_confidence, which saves samples in deterministic parts of the system (Default value = None)
+
     Returns:
         learned ONFSM
 
@@ -58,7 +62,7 @@ def run_non_det_Lstar(alphabet: list, sul: SUL, eq_oracle: Oracle, n_sampling=5,
 
     eq_oracle.sul = sul
 
-    ot = NonDetObservationTable(alphabet, sul, n_sampling)
+    ot = NonDetObservationTable(alphabet, sul, n_sampling, sampling_confidence)
 
     # Keep track of last counterexample and last hypothesis size
     # With this data we can check if the extension of the E set lead to state increase
@@ -70,8 +74,8 @@ def run_non_det_Lstar(alphabet: list, sul: SUL, eq_oracle: Oracle, n_sampling=5,
         if max_learning_rounds and learning_rounds - 1 == max_learning_rounds:
             break
 
-        ot.S = list()
-        ot.S.append((tuple(), tuple()))
+        # S is kept from the previous round, rows in it stay distinct after E is extended and cells of the
+        # new column are sampled when observations are queried
         ot.query_missing_observations()
 
         row_to_close = ot.get_row_to_close()
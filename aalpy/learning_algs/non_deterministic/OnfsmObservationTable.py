@@ -6,7 +6,7 @@ from aalpy.learning_algs.non_deterministic.NonDeterministicSULWrapper import Non
 
 class NonDetObservationTable:
 
-    def __init__(self, alphabet: list, sul: NonDeterministicSULWrapper, n_sampling):
+    def __init__(self, alphabet: list, sul: NonDeterministicSULWrapper, n_sampling, sampling_confidence=None):
         """
         Construction of the non-deterministic observation table.
 
@@ -15,6 +15,8 @@ class NonDetObservationTable:
             alphabet: input alphabet
             sul: system under learning
             n_sampling: number of samples to be performed for each cell
+            sampling_confidence: if set, sampling of a cell stops before n_sampling samples once the estimated
+                probability of observing a new output in the cell is at most 1 - sampling_confidence
         """
         assert alphabet is not None and sul is not None
 
@@ -25,6 +27,7 @@ class NonDetObservationTable:
         self.E = [tuple([a]) for a in alphabet]
 
         self.n_samples = n_sampling
+        self.sampling_confidence = sampling_confidence
         self.closing_counter = 0
 
         self.sul = sul
@@ -40,6 +43,13 @@ class NonDetObservationTable:
 
         self.pruned_nodes = set()
 
+        # row prefix -> (node reached by the row prefix, version of the node, hashable row over the first columns of E)
+        # a row changes only if nodes were added below its node, and E is only extended, so cached rows stay valid
+        # as long as the version of the node did not change, and only new columns have to be added to them
+        self.row_cache = dict()
+        # (row prefix, e) pairs that were sampled enough, they are not sampled again
+        self.sampled_cells = set()
+
     def get_row_to_close(self):
         """
         Get row for that need to be closed.
@@ -77,6 +87,7 @@ class NonDetObservationTable:
         """
 
         rows = self.S if row_prefix is None else [row_prefix]
+        s_set = set(self.S)
 
         S_dot_A = []
         for row in rows:
@@ -85,7 +96,7 @@ class NonDetObservationTable:
 
                 for t in trace:
                     new_row = (row[0] + a, row[1] + (t[-1],))
-                    if new_row not in self.S:
+                    if new_row not in s_set:
                         S_dot_A.append(new_row)
         return S_dot_A
 
@@ -95,8 +106,37 @@ class NonDetObservationTable:
 
         for s in s_set:
             for e in e_set:
-                while self.sul.cache.get_s_e_sampling_frequency(s, e) < self.n_samples:
+                if (s, e) in self.sampled_cells:
+                    continue
+                while not self.is_cell_sampled(s, e):
                     self.sul.query(s[0] + e)
+                self.sampled_cells.add((s, e))
+
+    def is_cell_sampled(self, s, e):
+        """
+        Checks whether the cell was sampled enough. Without sampling_confidence, each cell is sampled n_sampling
+        times. Otherwise sampling stops earlier, once the set of observed outputs is stable: the Good-Turing estimate
+        of the probability of an unobserved output, (number of outputs observed once + 1) / (number of samples + 1),
+        is at most 1 - sampling_confidence. Deterministic cells are then sampled about 1 / (1 - sampling_confidence)
+        times, while cells with rarely observed outputs are sampled until those outputs are observed repeatedly.
+
+        Args:
+
+            s: prefix
+            e: suffix
+
+        Returns:
+
+            True if the cell does not have to be sampled further
+        """
+        frequencies = self.sul.cache.get_s_e_output_frequencies(s, e)
+        num_samples = sum(frequencies)
+        if num_samples >= self.n_samples:
+            return True
+        if self.sampling_confidence is None:
+            return False
+        observed_once = sum(1 for frequency in frequencies if frequency == 1)
+        return (observed_once + 1) / (num_samples + 1) <= 1 - self.sampling_confidence
 
     def row_to_hashable(self, row_prefix):
         """
@@ -112,9 +152,15 @@ class NonDetObservationTable:
             hashable representation of the row
 
         """
-        row_repr = tuple()
-
-        for e in self.E:
+        cached = self.row_cache.get(row_prefix)
+        if cached is not None:
+            node = cached[0]
+            row_repr = cached[2] if cached[1] == node.version else tuple()
+        else:
+            node = self.sul.cache.get_to_node(row_prefix[0], row_prefix[1])
+            row_repr = tuple()
+
+        for e in self.E[len(row_repr):]:
             cell = self.sul.cache.get_all_traces(row_prefix, e)
             while cell is None:
                 self.query_missing_observations([row_prefix], [e])
@@ -122,6 +168,9 @@ class NonDetObservationTable:
 
             row_repr += (frozenset(cell),)
 
+        # rows whose prefix is not in the cache yet are not cached
+        if node is not None:
+            self.row_cache[row_prefix] = (node, node.version, row_repr)
         return row_repr
 
     def clean_obs_table(self):
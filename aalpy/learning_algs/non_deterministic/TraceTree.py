@@ -2,15 +2,20 @@ from collections import defaultdict
 
 
 class Node:
-    __slots__ = ['output', 'children', 'parent', 'frequency_counter']
+    __slots__ = ['output', 'children', 'parent', 'frequency_counter', 'prefix', 'version']
 
     def __init__(self, output):
         self.output = output
-        self.children = defaultdict(list)
+        # input -> output -> child
+        self.children = defaultdict(dict)
         self.parent = None
+        # outputs on the path from the root, computed on first lookup
+        self.prefix = None
 
         # frq counter
         self.frequency_counter = 0
+        # increased whenever a node is added to the subtree of this node
+        self.version = 0
 
     def get_child(self, inp, out):
         """
@@ -21,15 +26,22 @@ class Node:
         Returns:
 
         """
-        return next((child for child in self.children[inp] if child.output == out), None)
+        return self.children[inp].get(out)
 
     def get_prefix(self):
-        prefix = ()
-        curr_node = self
-        while curr_node.parent is not None:
-            prefix = (curr_node.output,) + prefix
-            curr_node = curr_node.parent
-        return prefix
+        if self.prefix is None:
+            # find the closest ancestor with a computed prefix and extend it along the path to this node
+            path = []
+            curr_node = self
+            while curr_node.prefix is None and curr_node.parent is not None:
+                path.append(curr_node)
+                curr_node = curr_node.parent
+            prefix = curr_node.prefix if curr_node.prefix is not None else ()
+            for node in reversed(path):
+                prefix = prefix + (node.output,)
+                node.prefix = prefix
+            self.prefix = prefix
+        return self.prefix
 
 
 class TraceTree:
@@ -54,13 +66,18 @@ class TraceTree:
           out: Output
 
         """
-        if inp not in self.curr_node.children.keys() or \
-                out not in {child.output for child in self.curr_node.children[inp]}:
+        children = self.curr_node.children[inp]
+        node = children.get(out)
+        if node is None:
             node = Node(out)
-            self.curr_node.children[inp].append(node)
+            children[out] = node
             node.parent = self.curr_node
+            ancestor = self.curr_node
+            while ancestor is not None:
+                ancestor.version += 1
+                ancestor = ancestor.parent
 
-        self.curr_node = self.curr_node.get_child(inp, out)
+        self.curr_node = node
         self.curr_node.frequency_counter += 1
 
     def add_trace(self, inputs, outputs):
@@ -111,18 +128,13 @@ class TraceTree:
             if curr_node is None:
                 return []
 
-        queue = [(curr_node, 0)]
-        reached_nodes = []
-        while queue:
-            node, depth = queue.pop(0)
-            if depth == len(e):
-                reached_nodes.append(node)
-            else:
-                children_with_same_input = node.children[e[depth]]
-                for c in children_with_same_input:
-                    queue.append((c, depth + 1))
-
-        cell = [node.get_prefix()[-len(e):] for node in reached_nodes]
+        # expand the tree level by level, keeping the outputs observed along e
+        reached = [(curr_node, ())]
+        for inp in e:
+            reached = [(child, outputs + (child.output,)) for node, outputs in reached
+                       for child in node.children[inp].values()]
+
+        cell = [outputs for _, outputs in reached]
         return cell
 
     def get_table(self, s, e):
@@ -162,32 +174,37 @@ class TraceTree:
                         return inputs, outputs
             for inp in curr_node.children.keys():
                 children = curr_node.children[inp]
-                for child in children:
+                for child in children.values():
                     # if curr_node.frequency_counter[(inp, child_out)] >= threshold:
                     queue.append((child, path + (inp, child.output)))
 
         return None
 
     def get_s_e_sampling_frequency(self, prefix, suffix):
-        sampling_frequency = 0
+        return sum(self.get_s_e_output_frequencies(prefix, suffix))
+
+    def get_s_e_output_frequencies(self, prefix, suffix):
+        """
+        Args:
+
+          prefix: prefix
+          suffix: List of inputs
+
+        Returns:
+
+          List containing the number of times each output trace was observed for the inputs of suffix after prefix
+        """
         curr_node = self.root_node
         for i, o in zip(prefix[0], prefix[1]):
             curr_node = curr_node.get_child(i, o)
             if curr_node is None:
-                return 0
+                return []
 
-        queue = [(curr_node, 0)]
-        while queue:
-            node, depth = queue.pop(0)
-            children_with_same_input = node.children[suffix[depth]]
-            if depth == len(suffix) - 1:
-                for c in children_with_same_input:
-                    sampling_frequency += c.frequency_counter
-            else:
-                for c in children_with_same_input:
-                    queue.append((c, depth + 1))
+        reached = [curr_node]
+        for inp in suffix[:-1]:
+            reached = [child for node in reached for child in node.children[inp].values()]
 
-        return sampling_frequency
+        return [c.frequency_counter for node in reached for c in node.children[suffix[-1]].values()]
 
     def get_sampling_distributions(self, prefix, input_from_alphabet):
         sampling_distribution = {}
@@ -195,7 +212,7 @@ class TraceTree:
         for i, o in zip(prefix[0], prefix[1]):
             curr_node = curr_node.get_child(i, o)
 
-        children = curr_node.children[input_from_alphabet]
+        children = curr_node.children[input_from_alphabet].values()
         sampling_sum = sum(c.frequency_counter for c in children)
         for c in children:
             sampling_distribution[c.output] = c.frequency_counter / sampling_sum
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from math import sqrt, log
 
+from aalpy.utils.HelperFunctions import frequency_count_matrices, is_numpy_available
+
 chi2_table = dict()
 
 chi2_table[0.95] = \
@@ -30,6 +32,20 @@ class DifferenceChecker(ABC):
     def are_cells_different(self, c1: dict, c2: dict, **kwargs) -> bool:
         pass
 
+    def are_cells_different_batch(self, cell_pairs: list, **kwargs) -> list:
+        """
+        Checks many pairs of cells at once. Implementations may override it with vectorized checks.
+
+        Args:
+
+            cell_pairs: list of (c1, c2) pairs of frequency dictionaries
+
+        Returns:
+
+            list containing the result of are_cells_different for each pair
+        """
+        return [self.are_cells_different(c1, c2, **kwargs) for c1, c2 in cell_pairs]
+
     def difference_value(self, c1: dict, c2: dict):
         return None
 
@@ -56,6 +72,38 @@ class HoeffdingChecker(DifferenceChecker):
                     return True
         return False
 
+    def are_cells_different_batch(self, cell_pairs: list, **kwargs) -> list:
+        if not is_numpy_available():
+            return super().are_cells_different_batch(cell_pairs)
+
+        results = [c1.keys() != c2.keys() for c1, c2 in cell_pairs]
+        to_check = [k for k, different_keys in enumerate(results) if not different_keys]
+        if to_check:
+            c1_counts, c2_counts, _ = frequency_count_matrices([cell_pairs[k] for k in to_check])
+            for k, is_different in zip(to_check, self.are_count_rows_different(c1_counts, c2_counts)):
+                results[k] = bool(is_different)
+        return results
+
+    def are_count_rows_different(self, c1_counts, c2_counts):
+        """
+        Vectorized Hoeffding test of many pairs of cells, encoded as NumPy count matrices over a shared output index,
+        where the k-th rows of both matrices form a pair. Outputs with zero count are considered not observed.
+
+        Returns:
+
+            boolean NumPy array with one decision per pair
+        """
+        import numpy as np
+
+        n1, n2 = c1_counts.sum(axis=1), c2_counts.sum(axis=1)
+        valid = (n1 > 0) & (n2 > 0)
+        n1, n2 = np.where(valid, n1, 1), np.where(valid, n2, 1)
+
+        different_support = ((c1_counts > 0) != (c2_counts > 0)).any(axis=1)
+        bound = (np.sqrt(1 / n1) + np.sqrt(1 / n2)) * sqrt(0.5 * log(2 / self.alpha))
+        diff = np.abs(c1_counts / n1[:, None] - c2_counts / n2[:, None])
+        return different_support | valid & (diff > bound[:, None]).any(axis=1)
+
 
 def compute_epsilon(alpha1, n1):
     epsilon1 = sqrt((1. / (2 * n1)) * log(2. / alpha1))
@@ -84,6 +132,34 @@ class AdvancedHoeffdingChecker(DifferenceChecker):
                     return True
         return False
 
+    def are_cells_different_batch(self, cell_pairs: list, **kwargs) -> list:
+        if not is_numpy_available():
+            return super().are_cells_different_batch(cell_pairs)
+
+        if not cell_pairs:
+            return []
+        c1_counts, c2_counts, _ = frequency_count_matrices(cell_pairs)
+        return [bool(d) for d in self.are_count_rows_different(c1_counts, c2_counts)]
+
+    def are_count_rows_different(self, c1_counts, c2_counts):
+        """
+        Vectorized test of many pairs of cells, encoded as NumPy count matrices over a shared output index,
+        where the k-th rows of both matrices form a pair.
+
+        Returns:
+
+            boolean NumPy array with one decision per pair
+        """
+        import numpy as np
+
+        n1, n2 = c1_counts.sum(axis=1), c2_counts.sum(axis=1)
+        valid = (n1 > 0) & (n2 > 0)
+        n1, n2 = np.where(valid, n1, 1), np.where(valid, n2, 1)
+
+        epsilon = np.sqrt((1. / (2 * n1)) * log(2. / self.alpha)) + np.sqrt((1. / (2 * n2)) * log(2. / self.alpha))
+        diff = np.abs(c1_counts / n1[:, None] - c2_counts / n2[:, None])
+        return valid & (diff > epsilon[:, None]).any(axis=1)
+
     def use_diff_value(self):
         return self.use_diff
 
@@ -141,6 +217,40 @@ class ChiSquareChecker(DifferenceChecker):
 
         return Q >= chi2_val
 
+    def are_cells_different_batch(self, cell_pairs: list, **kwargs) -> list:
+        if not is_numpy_available():
+            return super().are_cells_different_batch(cell_pairs)
+
+        results = [False] * len(cell_pairs)
+        disjoint_support, to_check, thresholds = [], [], []
+        for k, (c1_out_freq, c2_out_freq) in enumerate(cell_pairs):
+            if not c1_out_freq or not c2_out_freq:
+                continue
+            dof = len(set(c1_out_freq.keys()).union(c2_out_freq.keys())) - 1
+            if dof == 0:
+                continue
+            if not set(c1_out_freq.keys()).intersection(c2_out_freq.keys()):
+                disjoint_support.append(k)
+                continue
+            if dof not in self.chi2_values.keys():
+                raise ValueError("Too many possible outputs, chi2 table needs to be extended.")
+            to_check.append(k)
+            thresholds.append(self.chi2_values[dof])
+
+        # see are_cells_different, Hoeffding test is used if supports are disjoint
+        if disjoint_support:
+            hoeffding_results = AdvancedHoeffdingChecker().are_cells_different_batch(
+                [cell_pairs[k] for k in disjoint_support])
+            for k, is_different in zip(disjoint_support, hoeffding_results):
+                results[k] = is_different
+
+        if to_check:
+            Q = self.compute_Q_batch(*frequency_count_matrices([cell_pairs[k] for k in to_check]))
+            for k, q, chi2_val in zip(to_check, Q, thresholds):
+                results[k] = bool(q >= chi2_val)
+
+        return results
+
     def use_diff_value(self):
         return self.use_diff
 
@@ -175,3 +285,23 @@ class ChiSquareChecker(DifferenceChecker):
                     n_2 * p_hat_k)
             Q = Q + q_1_k + q_2_k
         return Q
+
+    @staticmethod
+    def compute_Q_batch(c1_counts, c2_counts, support):
+        """
+        Vectorized compute_Q for many pairs of cells, encoded as NumPy count matrices over a shared output index
+        (see frequency_count_matrices). Keys of each pair are the outputs marked in the support matrix.
+        """
+        import numpy as np
+
+        n_1 = c1_counts.sum(axis=1)[:, None]
+        n_2 = c2_counts.sum(axis=1)[:, None]
+
+        small_counts = ((c1_counts < 5) | (c2_counts < 5)) & support
+        yates_correction = np.where((support.sum(axis=1) == 2) & small_counts.any(axis=1), -0.5, 0.)[:, None]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_hat = (c1_counts + c2_counts) / (n_1 + n_2)
+            q_1 = ((np.abs(c1_counts - n_1 * p_hat)) + yates_correction) ** 2 / (n_1 * p_hat)
+            q_2 = ((np.abs(c2_counts - n_2 * p_hat)) + yates_correction) ** 2 / (n_2 * p_hat)
+            return np.where(support, q_1 + q_2, 0.).sum(axis=1)
@@ -47,6 +47,11 @@ class SamplingBasedObservationTable:
         self.compatibility_classes_representatives = None
         self.compatibility_class = dict()
         self.freq_query_cache = dict()
+        # (s1, s2, e) -> ((number of samples in cell s1 + e, number of samples in cell s2 + e), cells are different)
+        # frequencies of cells only grow, so results are valid as long as the number of samples did not change
+        self.cell_difference_cache = dict()
+        # rows, columns and numbers of samples in cells at the last update of compatibility classes
+        self.compatibility_signature = None
 
         self.unambiguity_values = []
 
@@ -107,8 +112,7 @@ class SamplingBasedObservationTable:
 
         resample_value = n_resample if self.strategy == 'classic' else max(dynamic // 2, 500)
 
-        for i in range(resample_value):
-            self.teacher.tree_query(pta_root)
+        self.teacher.tree_queries(pta_root, resample_value)
         return True
 
     def update_obs_table_with_freq_obs(self, element_of_s=None):
@@ -358,6 +362,11 @@ class SamplingBasedObservationTable:
         else:
             self.update_obs_table_with_freq_obs()
 
+        # remove cached results of removed rows and columns
+        columns = set(self.E)
+        self.cell_difference_cache = {(s1, s2, e): result for (s1, s2, e), result in self.cell_difference_cache.items()
+                                      if s1 in self.T and s2 in self.T and e in columns}
+
     def stop(self, learning_round, chaos_cex_present, cex, stopping_range_dict, min_rounds=10, max_rounds=None,
              target_unambiguity=0.99, print_unambiguity=False):
         """
@@ -448,15 +457,29 @@ class SamplingBasedObservationTable:
         """
         if self.strategy == 'classic':
             if self.teacher.complete_query(s1, e) and self.teacher.complete_query(s2, e):
-                return self.compatibility_checker.are_cells_different(self.T[s1][e], self.T[s2][e])
+                return self._are_cells_different(s1, s2, e)
         elif self.strategy == 'normal' or self.strategy == 'chi2':
             if e in self.T[s1] and e in self.T[s2]:
-                return self.compatibility_checker.are_cells_different(self.T[s1][e], self.T[s2][e])
+                return self._are_cells_different(s1, s2, e)
         else:
             if e in self.T[s1] and e in self.T[s2]:
                 return self.compatibility_checker.are_cells_different(self.T[s1][e], self.T[s2][e], s1=s1, s2=s2, e=e)
         return False
 
+    def _are_cells_different(self, s1, s2, e):
+        """
+        Compares cells with the compatibility checker, unless the result for the same numbers of samples is cached.
+        """
+        c1, c2 = self.T[s1][e], self.T[s2][e]
+        num_samples = (sum(c1.values()), sum(c2.values()))
+        cached = self.cell_difference_cache.get((s1, s2, e))
+        if cached is not None and cached[0] == num_samples:
+            return cached[1]
+
+        different = self.compatibility_checker.are_cells_different(c1, c2)
+        self.cell_difference_cache[(s1, s2, e)] = (num_samples, different)
+        return different
+
     def are_rows_compatible(self, s1, s2, e_ignore=None):
         """
         Check if the rows are compatible.
@@ -482,41 +505,97 @@ class SamplingBasedObservationTable:
                 return False
         return True
 
-    def update_compatibility_classes(self):
-        """Updates the compatibility classes and stores their representatives."""
-        self.compatibility_class.clear()
+    def get_compatible_rows(self, s1, rows, e_ignore=None):
+        """
+        Returns all rows compatible with s1. Cells of all rows are compared with a single batch check of the
+        compatibility checker.
 
-        class_rank_pair = []
-        for s in self.S:
-            rank = sum([sum(self.T[s][i].values()) for i in self.input_alphabet])
-            class_rank_pair.append((s, rank))
+        Args:
+          s1: prefix of row s1
+          rows: rows compared to s1
+          e_ignore: e not considered for the computation of row compatibility (Default value = None)
 
-        # sort according to frequency
-        class_rank_pair.sort(key=lambda x: x[1], reverse=True)
+        Returns:
+          list of rows compatible with s1, in the order of rows
 
-        # # sort according to prefix length, and elements of same length sort by value
-        # class_rank_pair = [(s, -rank) for (s, rank) in class_rank_pair]
-        # class_rank_pair.sort(key=lambda x: (len(x[0]), x[1]))
-        # class_rank_pair = [(s, -rank) for (s, rank) in class_rank_pair]
+        """
+        # custom strategies pass row information to the checker, so cells are compared one pair at a time
+        if self.strategy not in {'classic', 'normal', 'chi2'}:
+            return [s2 for s2 in rows if self.are_rows_compatible(s1, s2, e_ignore)]
 
-        compatibility_classes = [c[0] for c in class_rank_pair]
+        candidates = [s2 for s2 in rows if self.automaton_type != 'mdp' or s1[-1] == s2[-1]]
 
-        tmp_classes = list(compatibility_classes)
-        not_partitioned = list(self.S)
+        # cells without a cached result are compared in the batch
+        incompatible_rows = set()
+        cell_pairs, cell_keys, row_of_pair = [], [], []
+        for row_index, s2 in enumerate(candidates):
+            for e in self.E:
+                if e == e_ignore:
+                    continue
+                if self.strategy == 'classic':
+                    if not (self.teacher.complete_query(s1, e) and self.teacher.complete_query(s2, e)):
+                        continue
+                elif e not in self.T[s1] or e not in self.T[s2]:
+                    continue
+                c1, c2 = self.T[s1][e], self.T[s2][e]
+                num_samples = (sum(c1.values()), sum(c2.values()))
+                cached = self.cell_difference_cache.get((s1, s2, e))
+                if cached is not None and cached[0] == num_samples:
+                    if cached[1]:
+                        incompatible_rows.add(row_index)
+                    continue
+                cell_pairs.append((c1, c2))
+                cell_keys.append(((s1, s2, e), num_samples))
+                row_of_pair.append(row_index)
+
+        different = self.compatibility_checker.are_cells_different_batch(cell_pairs)
+        for k, is_different in enumerate(different):
+            key, num_samples = cell_keys[k]
+            self.cell_difference_cache[key] = (num_samples, is_different)
+            if is_different:
+                incompatible_rows.add(row_of_pair[k])
+        return [s2 for row_index, s2 in enumerate(candidates) if row_index not in incompatible_rows]
+
+    def update_compatibility_classes(self):
+        """
+        Updates the compatibility classes and stores their representatives. Rows are partitioned greedily, in the
+        order of decreasing frequency. Comparisons of cells that did not receive new samples are answered from the
+        cell difference cache.
+        """
+        # classes only change if rows, columns, or the number of samples in cells of rows changed since the last
+        # update; in the classic strategy cells are compared only if queries are complete, which depends on the teacher,
+        # and custom strategies pass row information to the checker
+        if self.strategy in {'normal', 'chi2'}:
+            signature = (tuple(self.E), tuple((s, tuple(sum(self.T[s][e].values()) if e in self.T[s] else None
+                                                        for e in self.E)) for s in self.S))
+            if signature == self.compatibility_signature:
+                return
+            self.compatibility_signature = signature
+
+        self.compatibility_class.clear()
+
+        # sort according to frequency (stable, rows of the same frequency keep their order in S)
+        rank = {s: sum([sum(self.T[s][i].values()) for i in self.input_alphabet]) for s in self.S}
+        ranked_rows = sorted(self.S, key=lambda s: rank[s], reverse=True)
 
+        # # sort according to prefix length, and elements of same length sort by value
+        # ranked_rows.sort(key=lambda s: (len(s), -rank[s]))
+
+        # rows that are not yet assigned to a class, in the order of S
+        not_partitioned = dict.fromkeys(self.S)
         representatives = []
-        while not_partitioned:
-            r = tmp_classes.pop(0)
-            not_partitioned.remove(r)
+        for r in ranked_rows:
+            if r not in not_partitioned:
+                continue
+            del not_partitioned[r]
 
-            cg_r = [s for s in not_partitioned if self.are_rows_compatible(r, s)]
+            cg_r = self.get_compatible_rows(r, not_partitioned.keys())
 
             self.compatibility_class[r] = cg_r
 
             representatives.append(r)
-            for sp in cg_r:
-                not_partitioned.remove(sp)
-                tmp_classes.remove(sp)
+            for s in cg_r:
+                del not_partitioned[s]
 
         self.compatibility_classes_representatives = representatives
 
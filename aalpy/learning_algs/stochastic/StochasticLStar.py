@@ -24,7 +24,8 @@ available_oracles, available_oracles_error_msg = get_available_oracles_and_err_m
 def run_stochastic_Lstar(input_alphabet, sul: SUL, eq_oracle: Oracle, target_unambiguity=0.99,
                          min_rounds=10, max_rounds=200, automaton_type='mdp', strategy='normal',
                          cex_processing=None, samples_cex_strategy=None, stopping_range_dict='strict', custom_oracle=False,
-                         return_data=False, property_based_stopping=None, n_c=20, n_resample=100, print_level=2):
+                         return_data=False, property_based_stopping=None, n_c=20, n_resample=100, print_level=2,
+                         num_processes=1):
     """
     Learning of Markov Decision Processes and Stochastic Mealy machines based on 'L*-Based Learning of Markov Decision
     Processes' and 'Active Model Learning of Stochastic Reactive Systems' by Tappler et al.
@@ -74,6 +75,9 @@ def run_stochastic_Lstar(input_alphabet, sul: SUL, eq_oracle: Oracle, target_una
         print_level: 0 - None, 1 - just results, 2 - current round and hypothesis size, 3 - educational/debug
             (Default value = 2)
 
+        num_processes: number of processes sampling the SUL in refine queries. If greater than 1, the SUL is copied
+            to each process, so it has to be picklable (Default value = 1)
+
 
     Returns:
 
@@ -103,7 +107,7 @@ def run_stochastic_Lstar(input_alphabet, sul: SUL, eq_oracle: Oracle, target_una
         stopping_range_dict = {7: 0.001, 12: 0.003, 17: 0.005, 22: 0.01, 28: 0.02}
 
     stochastic_teacher = StochasticTeacher(sul, n_c, eq_oracle, automaton_type, compatibility_checker,
-                                           samples_cex_strategy=samples_cex_strategy)
+                                           samples_cex_strategy=samples_cex_strategy, num_processes=num_processes)
 
     # This way all steps from eq. oracle will be added to the tree
     eq_oracle.sul = stochastic_teacher.sul
@@ -1,5 +1,5 @@
 from collections import defaultdict
-from random import choice, random
+from random import choice, random, getrandbits, seed
 
 from aalpy.base import SUL
 from aalpy.learning_algs.stochastic.DifferenceChecker import DifferenceChecker
@@ -36,6 +36,8 @@ class Node:
         self.frequency = 0
         self.children = defaultdict(dict)
         self.input_frequencies = defaultdict(int)
+        # increased whenever frequencies of children change
+        self.version = 0
 
     def get_child(self, inp, out):
         """
@@ -85,7 +87,7 @@ class StochasticTeacher:
     """
 
     def __init__(self, sul: SUL, n_c, eq_oracle, automaton_type, compatibility_checker: DifferenceChecker,
-                 samples_cex_strategy=None):
+                 samples_cex_strategy=None, num_processes=1):
         self.automaton_type = automaton_type
         if automaton_type == 'mdp':
             self.initial_value = sul.query(tuple())
@@ -101,8 +103,13 @@ class StochasticTeacher:
         self.curr_node = None
         # cache
         self.complete_query_cache = set()
+        # s + e -> (node reached by s + e without its last input, version of the node, output frequencies)
+        # output frequencies are valid as long as the version of the node did not change
+        self.frequency_query_cache = dict()
         self.compatibility_checker = compatibility_checker
         self.samples_cex_strategy = samples_cex_strategy
+        # number of processes executing tree queries
+        self.num_processes = num_processes
 
         # eq query cache
         self.last_cex = None
@@ -127,6 +134,7 @@ class StochasticTeacher:
             node = Node(out)
             self.curr_node.children[inp][out] = node
 
+        self.curr_node.version += 1
         self.curr_node = self.curr_node.children[inp][out]
         self.curr_node.frequency += 1
 
@@ -144,6 +152,11 @@ class StochasticTeacher:
             sum of output frequencies
 
         """
+        trace = s + e
+        cached = self.frequency_query_cache.get(trace)
+        if cached is not None and cached[0].version == cached[1]:
+            return cached[2]
+
         if self.automaton_type == 'mdp':
             s = s[1:]
 
@@ -159,6 +172,7 @@ class StochasticTeacher:
                 return dict()
 
         output_freq = curr_node.get_output_frequencies(last_input)
+        self.frequency_query_cache[trace] = (curr_node, curr_node.version, output_freq)
         if sum(output_freq.values()) >= self.n_c:
             self.complete_query_cache.add(s + e)
         return output_freq
@@ -183,6 +197,14 @@ class StochasticTeacher:
         if s + e in self.complete_query_cache:
             return True
 
+        # nodes are never removed from the tree, so a node reached by a frequency query can be reused
+        cached = self.frequency_query_cache.get(s + e)
+        if cached is not None:
+            sum_freq = cached[0].get_frequency_sum(e[-1])
+            if sum_freq >= self.n_c:
+                self.complete_query_cache.add(s[1:] + e if self.automaton_type == 'mdp' else s + e)
+            return sum_freq >= self.n_c
+
         if self.automaton_type == 'mdp':
             s = s[1:]
 
@@ -217,52 +239,49 @@ class StochasticTeacher:
 
             pta_root: root of the PTA
 
-        Returns:
-
-            number of steps taken
+        """
+        inputs, _, complete = _sample_pta_trace(self.sul, pta_root)
+        if complete:
+            for i in inputs:
+                self.curr_node.input_frequencies[i] -= 1
 
+    def tree_queries(self, pta_root, num_queries):
         """
-        self.sul.pre()
-        curr_node = pta_root
+        Execute num_queries refine queries (see tree_query). If the teacher was created with num_processes greater
+        than 1, queries are executed on copies of the SUL in parallel processes and their traces are added to the
+        tree afterwards, in the order in which the processes sampled them.
 
-        inputs = []
-        outputs = []
+        Args:
 
-        while True:
+            pta_root: root of the PTA
+            num_queries: number of queries to execute
 
-            if curr_node.children:
-                frequency_sum = sum(curr_node.input_frequencies.values())
-                if frequency_sum == 0:
-                    # uniform sampling in case we have no information
-                    inp = choice(list(curr_node.children.keys()))
-                else:
-                    # use float random rather than integers to be able to work with non-integer frequency information
-                    selection_value = random() * frequency_sum
-                    inp = None
-                    for i in curr_node.input_frequencies.keys():
-                        inp = i
-                        selection_value -= curr_node.input_frequencies[i]
-                        if selection_value <= 0:
-                            break
-                    # curr_node.input_frequencies[inp] -= 1
-
-                inputs.append(inp)
-                out = self.sul.step(inp)
-                new_node = curr_node.get_child(inp, out)
-
-                if new_node:
-                    outputs.append(out)
-                    curr_node = new_node
-                else:
-                    self.sul.post()
-                    return
-            else:
-                curr_node = pta_root
+        """
+        if self.num_processes <= 1 or num_queries <= 1:
+            for _ in range(num_queries):
+                self.tree_query(pta_root)
+            return
+
+        from multiprocessing import Pool
+
+        num_workers = min(self.num_processes, num_queries)
+        # each process samples with its own seed drawn from the global random generator, otherwise forked processes
+        # would sample identical traces
+        tasks = [(pta_root, num_queries // num_workers + (1 if w < num_queries % num_workers else 0),
+                  getrandbits(64)) for w in range(num_workers)]
+        with Pool(num_workers, initializer=_init_tree_query_worker, initargs=(self.sul.sul,)) as pool:
+            sampled_traces = pool.starmap(_sample_pta_traces, tasks)
+
+        for traces in sampled_traces:
+            for inputs, outputs, complete in traces:
+                self.sul.num_queries += 1
+                self.back_to_root()
                 for i, o in zip(inputs, outputs):
-                    self.curr_node.input_frequencies[i] -= 1
-                    curr_node = curr_node.get_child(i, o)
-                self.sul.post()
-                return
+                    self.sul.num_steps += 1
+                    self.add(i, o)
+                if complete:
+                    for i in inputs:
+                        self.curr_node.input_frequencies[i] -= 1
 
     def single_dfs_for_cex(self, stop_prob, hypothesis):
         curr_node = self.root_node
@@ -391,3 +410,70 @@ class StochasticTeacher:
                 return False
         o = hypothesis.step(last_inp)
         return o is not None
+
+
+# copy of the SUL used by tree query worker processes
+_worker_sul = None
+
+
+def _init_tree_query_worker(sul):
+    global _worker_sul
+    _worker_sul = sul
+
+
+def _sample_pta_traces(pta_root, num_queries, random_seed):
+    seed(random_seed)
+    return [_sample_pta_trace(_worker_sul, pta_root) for _ in range(num_queries)]
+
+
+def _sample_pta_trace(sul, pta_root):
+    """
+    Executes a single refine query on the SUL, choosing inputs by their frequencies in the PTA until the PTA is left.
+
+    Args:
+
+        sul: system under learning
+        pta_root: root of the PTA
+
+    Returns:
+
+        executed inputs, observed outputs and whether the query reached a leaf of the PTA
+
+    """
+    sul.pre()
+    curr_node = pta_root
+
+    inputs = []
+    outputs = []
+
+    while True:
+
+        if curr_node.children:
+            frequency_sum = sum(curr_node.input_frequencies.values())
+            if frequency_sum == 0:
+                # uniform sampling in case we have no information
+                inp = choice(list(curr_node.children.keys()))
+            else:
+                # use float random rather than integers to be able to work with non-integer frequency information
+                selection_value = random() * frequency_sum
+                inp = None
+                for i in curr_node.input_frequencies.keys():
+                    inp = i
+                    selection_value -= curr_node.input_frequencies[i]
+                    if selection_value <= 0:
+                        break
+                # curr_node.input_frequencies[inp] -= 1
+
+            inputs.append(inp)
+            out = sul.step(inp)
+            outputs.append(out)
+            new_node = curr_node.get_child(inp, out)
+
+            if new_node:
+                curr_node = new_node
+            else:
+                sul.post()
+                return inputs, outputs, False
+        else:
+            sul.post()
+            return inputs, outputs, True
@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from random import randint, choice
 
-from aalpy.learning_algs import run_Alergia
+from aalpy.learning_algs.stochastic_passive.Alergia import Alergia
 
 
 class Sampler(ABC):
@@ -75,14 +75,18 @@ def run_active_Alergia(data, sul, sampler, n_iter, eps=0.05, compatibility_check
         learned MDP
 
     """
+    # FPTA and memoized compatibility results are kept across iterations, only new samples are added to it
+    alergia = Alergia(data, automaton_type='mdp', eps=eps, compatibility_checker=compatibility_checker)
+
     model = None
     for i in range(n_iter):
         if print_info:
             print(f'Active Alergia Iteration: {i}')
-        model = run_Alergia(data, automaton_type='mdp', eps=eps, compatibility_checker=compatibility_checker)
+        model = alergia.run()
 
         new_samples = sampler.sample(sul, model)
         data.extend(new_samples)
+        alergia.insert_data(new_samples)
 
     return model
 
@@ -4,33 +4,85 @@ from bisect import insort
 from aalpy.automata import MarkovChain, MdpState, Mdp, McState, StochasticMealyState, \
     StochasticMealyMachine
 from aalpy.learning_algs.stochastic_passive.CompatibilityChecker import HoeffdingCompatibility
-from aalpy.learning_algs.stochastic_passive.FPTA import create_fpta
+from aalpy.learning_algs.stochastic_passive.FPTA import create_fpta, add_sequence_to_fpta
+from aalpy.utils.DataHandler import EncodedTraces
 
 state_automaton_map = {'mc': (McState, MarkovChain), 'mdp': (MdpState, Mdp),
                        'smm': (StochasticMealyState, StochasticMealyMachine)}
 
+# minimal number of red states for which statistical tests against a blue state are done in one batch, for fewer
+# states the overhead of the batch outweighs the tests skipped by checking red states one by one
+min_batch_size = 16
+
 
 class Alergia:
-    def __init__(self, data, automaton_type, eps=0.05, compatibility_checker=None, print_info=False):
+    def __init__(self, data, automaton_type, eps=0.05, compatibility_checker=None, print_info=False, num_processes=1,
+                 sampling_depth=None, sampling_rate=0.1):
         assert eps == 'auto' or 0 < eps <= 2
+        assert sampling_depth is None or 0 < sampling_rate <= 1
 
         self.automaton_type = automaton_type
         self.print_info = print_info
+        self.sampling_depth = sampling_depth
+        self.sampling_rate = sampling_rate
 
+        # number of steps in the data, used if eps is set to 'auto'
+        self.auto_eps_steps = _get_number_of_steps(data, automaton_type) if eps == 'auto' else None
         if eps == 'auto':
-            eps = 10 / sum(len(d) - 1 for d in data)  # len - 1 to ignore initial output
+            eps = 10 / self.auto_eps_steps
 
         self.diff_checker = HoeffdingCompatibility(eps) if not compatibility_checker else compatibility_checker
+        # (id(a), id(b)) -> result of the compatibility test of FPTA nodes a and b
+        self.compatibility_memo = dict()
+        # id(node) -> node, for all nodes whose mutable values were changed by merging
+        self.merged_nodes = dict()
 
         pta_start = time.time()
 
-        self.fpta = create_fpta(data, automaton_type)
+        self.fpta = create_fpta(data, automaton_type, num_processes, sampling_depth, sampling_rate)
 
         pta_time = round(time.time() - pta_start, 2)
         if self.print_info:
             print(f'PTA Construction Time:  {pta_time}')
 
     def compatibility_test(self, a, b):
+        """
+        Checks whether the subtrees rooted in a and b are compatible. Shared subtrees are traversed with an explicit
+        stack, and results are memoized for each pair of nodes. As the test only depends on the immutable (original)
+        frequencies, memoized results stay valid until new data is added to the FPTA.
+        """
+        result = self._local_compatibility(a, b)
+        if result is not None:
+            return result
+
+        # each stack entry holds a pair of nodes and an iterator over their common children
+        stack = [(a, b, self._common_children(a, b))]
+        while stack:
+            x, y, children = stack[-1]
+            for child_x, child_y in children:
+                child_result = self._local_compatibility(child_x, child_y)
+                if child_result is False:
+                    # all pairs on the stack contain the incompatible pair in their future
+                    for stack_x, stack_y, _ in stack:
+                        self.compatibility_memo[(id(stack_x), id(stack_y))] = False
+                    return False
+                if child_result is None:
+                    stack.append((child_x, child_y, self._common_children(child_x, child_y)))
+                    break
+            else:
+                stack.pop()
+                self.compatibility_memo[(id(x), id(y))] = True
+
+        return True
+
+    def _local_compatibility(self, a, b):
+        """
+        Returns the result of the compatibility test if it can be decided without checking the future of a and b,
+        None otherwise.
+        """
+        memoized = self.compatibility_memo.get((id(a), id(b)))
+        if memoized is not None:
+            return memoized
 
         # for MDPs and MC output of the state needs to be the same
         if self.automaton_type != 'smm' and a.output != b.output:
@@ -42,14 +94,78 @@ class Alergia:
 
         # if states are statistically different, do not merge
         if self.diff_checker.are_states_different(a, b):
+            self.compatibility_memo[(id(a), id(b))] = False
             return False
 
-        # check future for compatibility
-        for el in set(a.original_children.keys()).intersection(b.original_children.keys()):
-            if not self.compatibility_test(a.original_children[el], b.original_children[el]):
-                return False
-
-        return True
+        return None
+
+    def _different_from_blue(self, red, blue):
+        """
+        Returns ids of red states found statistically different from the blue state, using the batch check of the
+        compatibility checker. Results are stored in the compatibility memo.
+        """
+        if len(red) < min_batch_size:
+            return set()
+
+        to_check = [r for r in red if (id(r), id(blue)) not in self.compatibility_memo
+                    and (self.automaton_type == 'smm' or r.output == blue.output)
+                    and r.original_children and blue.original_children]
+        if len(to_check) < min_batch_size:
+            return set()
+
+        different = set()
+        for r, is_different in zip(to_check, self.diff_checker.are_states_different_batch([(r, blue) for r in to_check])):
+            if is_different:
+                self.compatibility_memo[(id(r), id(blue))] = False
+                different.add(id(r))
+        return different
+
+    @staticmethod
+    def _common_children(a, b):
+        return ((a.original_children[el], b.original_children[el])
+                for el in a.original_children.keys() if el in b.original_children)
+
+    def clear_compatibility_memo(self):
+        """
+        Clears memoized compatibility results. Has to be called whenever original frequencies of the FPTA change.
+        """
+        self.compatibility_memo.clear()
+
+    def insert_data(self, data):
+        """
+        Adds new sequences to the FPTA, so that the next call of run learns a model from all data seen so far.
+        Merges of the previous run are undone, and only memoized compatibility results of nodes whose frequencies
+        changed are discarded.
+
+        Args:
+
+            data: new sequences, in the same format as the data passed to the constructor
+        """
+        self.reset_merges()
+
+        updated_nodes = set()
+        sequences = data.alergia_sequences(self.automaton_type) if isinstance(data, EncodedTraces) else data
+        for seq in sequences:
+            add_sequence_to_fpta(self.fpta, seq, self.automaton_type, updated_nodes, self.sampling_depth,
+                                 self.sampling_rate)
+
+        if self.auto_eps_steps is not None:
+            # eps depends on the size of the data, so all results have to be recomputed
+            self.auto_eps_steps += _get_number_of_steps(data, self.automaton_type)
+            self.diff_checker = HoeffdingCompatibility(10 / self.auto_eps_steps)
+            self.clear_compatibility_memo()
+        else:
+            # the subtree of each node on a path of a new sequence changed, other results remain valid
+            self.compatibility_memo = {pair: result for pair, result in self.compatibility_memo.items()
+                                       if pair[0] not in updated_nodes and pair[1] not in updated_nodes}
+
+    def reset_merges(self):
+        """
+        Restores mutable values of all nodes changed by merging, so that the FPTA is in its unmerged form.
+        """
+        for node in self.merged_nodes.values():
+            node.reset()
+        self.merged_nodes.clear()
 
     def merge(self, red_state, blue_state):
         b_prefix = blue_state.prefix
@@ -57,24 +173,46 @@ class Alergia:
         for p in b_prefix[:-1]:
             to_update = to_update.children[p]
 
+        self._make_mutable(to_update)
         to_update.children[b_prefix[-1]] = red_state
 
         self.fold(red_state, blue_state)
 
     def fold(self, red, blue):
-        for i, blue_child in blue.children.items():
-            if i in red.children:
-                red.input_frequency[i] += blue.input_frequency[i]
-                self.fold(red.children[i], blue_child)
+        # depth-first traversal with an explicit stack, so that deep FPTAs do not exceed the recursion limit
+        self._make_mutable(red)
+        stack = [(red, blue, iter(blue.children.items()))]
+        while stack:
+            red, blue, blue_children = stack[-1]
+            for i, blue_child in blue_children:
+                if i in red.children:
+                    red.input_frequency[i] += blue.input_frequency[i]
+                    red_child = red.children[i]
+                    self._make_mutable(red_child)
+                    stack.append((red_child, blue_child, iter(blue_child.children.items())))
+                    break
+                else:
+                    red.children[i] = blue.children[i]
+                    red.input_frequency[i] = blue.input_frequency[i]
             else:
-                red.children[i] = blue.children[i]
-                red.input_frequency[i] = blue.input_frequency[i]
+                stack.pop()
+
+    def _make_mutable(self, node):
+        if id(node) not in self.merged_nodes:
+            node.make_mutable()
+            self.merged_nodes[id(node)] = node
+        # mutable frequencies of the node are about to change
+        node.input_totals = None
 
     def run(self):
         start_time = time.time()
 
+        # undo merges of the previous run, if any
+        self.reset_merges()
+
         # representative nodes that will be included in the final output model
         red = [self.fpta]
+        red_ids = {id(self.fpta)}
         # intermediate successors scheduled for testing
         blue = self.fpta.successors()
 
@@ -83,7 +221,13 @@ class Alergia:
             lex_min_blue = min(list(blue))
             merged = False
 
+            # statistical tests of all red states against the blue state are done in one batch, so that only red
+            # states passing it are checked recursively
+            different = self._different_from_blue(red, lex_min_blue)
+
             for red_state in red:
+                if id(red_state) in different:
+                    continue
                 if self.compatibility_test(red_state, lex_min_blue):
                     self.merge(red_state, lex_min_blue)
                     merged = True
@@ -91,12 +235,13 @@ class Alergia:
 
             if not merged:
                 insort(red, lex_min_blue)
+                red_ids.add(id(lex_min_blue))
 
             blue.clear()
 
             for r in red:
                 for s in r.successors():
-                    if s not in red:
+                    if id(s) not in red_ids:
                         blue.append(s)
 
         assert sorted(red, key=lambda x: len(x.prefix)) == red
@@ -162,7 +307,15 @@ class Alergia:
         return a_c(initial_state, states)
 
 
-def run_Alergia(data, automaton_type, eps=0.05, compatibility_checker=None, print_info=False):
+def _get_number_of_steps(data, automaton_type):
+    # len - 1 to ignore initial output
+    if isinstance(data, EncodedTraces):
+        return int((data.get_alergia_sequence_lengths(automaton_type) - 1).sum())
+    return sum(len(d) - 1 for d in data)
+
+
+def run_Alergia(data, automaton_type, eps=0.05, compatibility_checker=None, print_info=False, num_processes=1,
+                sampling_depth=None, sampling_rate=0.1):
     """
     Run Alergia or IOAlergia on provided data.
 
@@ -170,7 +323,7 @@ def run_Alergia(data, automaton_type, eps=0.05, compatibility_checker=None, prin
 
         data: data either in a form [[I,I,I],[I,I,I],...] if learning Markov Chains or [[O,(I,O),(I,O)...],
         [O,(I,O), (I, O)_,...],..,] if learning MDPs, or [[I,O,I,O...], [I,O_,...],..,] if learning SMMs
-         (I represents input, O output).
+         (I represents input, O output). Alternatively, integer-encoded traces can be passed as EncodedTraces.
         Note that in whole data first symbol of each entry should be the same (Initial output of the MDP/MC).
 
         eps: epsilon value if you are using default HoeffdingCompatibility. If it is set to 'auto' it will be computed
@@ -184,19 +337,32 @@ def run_Alergia(data, automaton_type, eps=0.05, compatibility_checker=None, prin
         (note: not interchangeable, depends on data)
         print_info:
 
+        num_processes: number of processes used to construct the FPTA. If greater than 1, data is split into equally
+        sized shards whose FPTAs are constructed in parallel and summed into a single FPTA
+
+        sampling_depth: if set, bounds the size of the FPTA on large datasets. Frequencies of FPTA nodes up to this
+        depth are exact, while steps below it are only added for a random sample of sequences (see sampling_rate).
+        Deep, rarely visited FPTA branches hold most of the nodes, but have little effect on merging decisions.
+        Frequencies below the sampling depth are scaled by 1 / sampling_rate, and compatibility checks of such nodes
+        use a wider bound, which is based on the number of sampled sequences.
+
+        sampling_rate: fraction of sequences whose steps below sampling_depth are added to the FPTA
+
     Returns:
 
         mdp, smm, or markov chain
     """
     assert automaton_type in {'mdp', 'mc', 'smm'}
     alergia = Alergia(data, eps=eps, automaton_type=automaton_type,
-                      compatibility_checker=compatibility_checker, print_info=print_info)
+                      compatibility_checker=compatibility_checker, print_info=print_info, num_processes=num_processes,
+                      sampling_depth=sampling_depth, sampling_rate=sampling_rate)
     model = alergia.run()
     del alergia.fpta, alergia
     return model
 
 
-def run_JAlergia(path_to_data_file, automaton_type, path_to_jAlergia_jar, eps=0.05, heap_memory='-Xmx2048M'):
+def run_JAlergia(path_to_data_file, automaton_type, path_to_jAlergia_jar, eps=0.05, heap_memory='-Xmx2048M',
+                 exchange='file'):
     """
     Run Alergia or IOAlergia on provided data.
 
@@ -212,6 +378,11 @@ def run_JAlergia(path_to_data_file, automaton_type, path_to_jAlergia_jar, eps=0.
 
         heap_memory: java heap memory flag, increase if heap is full
 
+        exchange: either 'file' or 'pipe'. With 'file', data and the learned model are exchanged over files in the
+        current working directory. With 'pipe', data is streamed to the standard input of the JVM and the model
+        is saved to a private temporary directory, so the working directory is not touched and several runs can
+        be executed concurrently.
+
         automaton_type: either 'mdp' if you wish to learn an MDP, 'mc' if you want to learn Markov Chain,
          or 'smm' if you
                         want to learn stochastic Mealy machine
@@ -222,11 +393,15 @@ def run_JAlergia(path_to_data_file, automaton_type, path_to_jAlergia_jar, eps=0.
         learnedModel
     """
     assert automaton_type in {'mdp', 'smm', 'mc'}
+    assert exchange in {'file', 'pipe'}
 
     import os
     import subprocess
     from aalpy.utils.FileHandler import load_automaton_from_file
 
+    if exchange == 'pipe':
+        return _run_JAlergia_with_pipe(path_to_data_file, automaton_type, path_to_jAlergia_jar, eps, heap_memory)
+
     save_file = "jAlergiaModel.dot"
     delete_tmp_file = False
     if os.path.exists(save_file):
@@ -266,3 +441,116 @@ def run_JAlergia(path_to_data_file, automaton_type, path_to_jAlergia_jar, eps=0.
         os.remove('jAlergiaInputs.txt')
 
     return model
+
+
+def _write_jAlergia_data(f, data):
+    for seq in data:
+        f.write(','.join(map(str, seq)))
+        f.write('\n')
+
+
+def _run_JAlergia_with_pipe(data, automaton_type, path_to_jAlergia_jar, eps, heap_memory):
+    import os
+    import subprocess
+    import tempfile
+
+    if not os.path.exists(path_to_jAlergia_jar):
+        print(f'JAlergia jar not found at {path_to_jAlergia_jar}.')
+        return
+
+    if isinstance(data, str) and not os.path.exists(data):
+        print('Input file not found.')
+        return
+    if not isinstance(data, (str, list, tuple)):
+        print('Data should be either a list of sequences or a path to the data file.')
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # jAlergia appends .dot to the save location
+        save_location = os.path.join(tmp_dir, 'jAlergiaModel')
+
+        stream_data = False
+        if isinstance(data, str):
+            input_path = os.path.abspath(data)
+        elif os.path.exists('/dev/stdin'):
+            input_path = '/dev/stdin'
+            stream_data = True
+        else:
+            # no stdin device available (Windows), data is written to the temporary directory
+            input_path = os.path.join(tmp_dir, 'jAlergiaInputs.txt')
+            with open(input_path, 'w') as f:
+                _write_jAlergia_data(f, data)
+
+        process = subprocess.Popen(['java', heap_memory, '-jar', os.path.abspath(path_to_jAlergia_jar),
+                                    '-input', input_path, '-eps', str(eps), '-type', automaton_type,
+                                    '-save', save_location],
+                                   stdin=subprocess.PIPE if stream_data else None,
+                                   text=True, bufsize=1 << 20)
+        if stream_data:
+            try:
+                _write_jAlergia_data(process.stdin, data)
+                process.stdin.close()
+            except BrokenPipeError:
+                # JVM terminated before reading all data, error is reported below
+                pass
+        process.wait()
+
+        if process.returncode != 0 or not os.path.exists(save_location + '.dot'):
+            print("JAlergia error occurred.")
+            return
+
+        return _load_jAlergia_model(save_location + '.dot', automaton_type)
+
+
+def _load_jAlergia_model(path, automaton_type):
+    """
+    Loads the model saved by jAlergia. As jAlergia always writes one node or edge per line, lines are split directly
+    instead of matching them with the regular expressions of the general dot parser.
+    """
+    state_class, automaton_class = state_automaton_map[automaton_type]
+
+    def label_of(line):
+        start = line.index('label=') + 6
+        if line[start] == '"':
+            return line[start + 1:line.index('"', start + 1)]
+        end = start
+        while line[end] not in ' ,]':
+            end += 1
+        return line[start:end]
+
+    def cast(symbol):
+        return int(symbol) if symbol.isdigit() else symbol
+
+    states = dict()
+    initial_state_id = None
+    transitions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if 'label=' not in line or line.startswith('__start0 ['):
+                continue
+            if '->' in line:
+                source, destination = line.split('->', 1)
+                source, destination = source.strip(), destination.split('[', 1)[0].strip()
+                if source == '__start0':
+                    initial_state_id = destination
+                else:
+                    transitions.append((source, destination, label_of(line)))
+            else:
+                state_id = line.split('[', 1)[0].strip()
+                states[state_id] = state_class(state_id, label_of(line)) if automaton_type != 'smm' \
+                    else state_class(state_id)
+
+    for source, destination, label in transitions:
+        source, destination = states[source], states[destination]
+        if automaton_type == 'mc':
+            source.transitions.append((destination, float(label)))
+        elif automaton_type == 'mdp':
+            i, prob = label.rsplit(':', 1)
+            source.transitions[cast(i)].append((destination, float(prob)))
+        else:
+            i, out_prob = label.split('/', 1)
+            o, prob = out_prob.rsplit(':', 1)
+            source.transitions[cast(i)].append((destination, cast(o), float(prob)))
+
+    return automaton_class(states[initial_state_id], list(states.values()))
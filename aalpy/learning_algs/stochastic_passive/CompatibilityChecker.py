@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from math import sqrt, log
 
 from aalpy.learning_algs.stochastic_passive.FPTA import AlergiaPtaNode
+from aalpy.utils.HelperFunctions import frequency_count_matrices, is_numpy_available
 
 
 class CompatibilityChecker(ABC):
@@ -10,20 +11,38 @@ class CompatibilityChecker(ABC):
     def are_states_different(self, a: AlergiaPtaNode, b: AlergiaPtaNode, **kwargs) -> bool:
         pass
 
+    def are_states_different_batch(self, state_pairs: list, **kwargs) -> list:
+        """
+        Checks many pairs of states at once. Implementations may override it with vectorized checks.
+
+        Args:
+
+            state_pairs: list of (a, b) pairs of FPTA nodes
+
+        Returns:
+
+            list containing the result of are_states_different for each pair
+        """
+        return [self.are_states_different(a, b, **kwargs) for a, b in state_pairs]
+
 
 class HoeffdingCompatibility(CompatibilityChecker):
     def __init__(self, eps):
         self.eps = eps
         self.log_term = sqrt(0.5 * log(2 / self.eps))
 
-    def hoeffding_bound(self, a: dict, b: dict):
+    def hoeffding_bound(self, a: dict, b: dict, a_weight=1, b_weight=1):
+        """
+        Weights are sample weights of frequencies estimated from a sample of sequences. The bound is computed from the
+        number of sampled observations, and is therefore wider than the bound of exact frequencies of the same size.
+        """
         n1 = sum(a.values())
         n2 = sum(b.values())
 
         if n1 * n2 == 0:
             return False
 
-        bound = (sqrt(1 / n1) + sqrt(1 / n2)) * self.log_term
+        bound = (sqrt(a_weight / n1) + sqrt(b_weight / n2)) * self.log_term
 
         for o in set(a.keys()).union(b.keys()):
             a_freq = a[o] if o in a else 0
@@ -33,6 +52,26 @@ class HoeffdingCompatibility(CompatibilityChecker):
                 return True
         return False
 
+    def hoeffding_bound_batch(self, a_counts, b_counts, a_weights=1, b_weights=1):
+        """
+        Vectorized hoeffding_bound for many pairs of frequency distributions, encoded as NumPy count matrices over a
+        shared output index, where the k-th rows of both matrices form a pair. Sample weights are either scalars or
+        arrays with one weight per row.
+
+        Returns:
+
+            boolean NumPy array with one decision per pair
+        """
+        import numpy as np
+
+        n1, n2 = a_counts.sum(axis=1), b_counts.sum(axis=1)
+        valid = (n1 > 0) & (n2 > 0)
+        n1, n2 = np.where(valid, n1, 1), np.where(valid, n2, 1)
+
+        bound = (np.sqrt(a_weights / n1) + np.sqrt(b_weights / n2)) * self.log_term
+        diff = np.abs(a_counts / n1[:, None] - b_counts / n2[:, None])
+        return valid & (diff > bound[:, None]).any(axis=1)
+
     def are_states_different(self, a: AlergiaPtaNode, b: AlergiaPtaNode, **kwargs):
 
         # no data available for any node
@@ -40,11 +79,42 @@ class HoeffdingCompatibility(CompatibilityChecker):
             return False
 
         # assuming tuples are used for IOAlergia and not as Alergia outputs
-        if not isinstance(list(a.original_input_frequency.keys())[0], tuple):
-            return self.hoeffding_bound(a.original_input_frequency, b.original_input_frequency)
+        if not isinstance(next(iter(a.original_input_frequency)), tuple):
+            return self.hoeffding_bound(a.original_input_frequency, b.original_input_frequency,
+                                        a.sample_weight, b.sample_weight)
 
         # IOAlergia: check hoeffding bound conditioned on inputs
         for i in a.get_immutable_inputs().intersection(b.get_immutable_inputs()):
-            if self.hoeffding_bound(a.get_original_output_frequencies(i), b.get_original_output_frequencies(i)):
+            if self.hoeffding_bound(a.get_original_output_frequencies(i), b.get_original_output_frequencies(i),
+                                    a.sample_weight, b.sample_weight):
                 return True
         return False
+
+    def are_states_different_batch(self, state_pairs: list, **kwargs):
+        if not is_numpy_available():
+            return super().are_states_different_batch(state_pairs)
+
+        import numpy as np
+
+        # each compared distribution is a row, pair_of_row maps rows to the index of the pair they belong to
+        distribution_pairs, pair_of_row = [], []
+        for k, (a, b) in enumerate(state_pairs):
+            if len(a.original_input_frequency) * len(b.original_children) == 0:
+                continue
+            if not isinstance(next(iter(a.original_input_frequency)), tuple):
+                distribution_pairs.append((a.original_input_frequency, b.original_input_frequency))
+                pair_of_row.append(k)
+                continue
+            for i in a.get_immutable_inputs().intersection(b.get_immutable_inputs()):
+                distribution_pairs.append((a.get_original_output_frequencies(i), b.get_original_output_frequencies(i)))
+                pair_of_row.append(k)
+        a_weights = np.array([state_pairs[k][0].sample_weight for k in pair_of_row])
+        b_weights = np.array([state_pairs[k][1].sample_weight for k in pair_of_row])
+
+        if not distribution_pairs:
+            return [False] * len(state_pairs)
+
+        a_counts, b_counts, _ = frequency_count_matrices(distribution_pairs)
+        different_rows = self.hoeffding_bound_batch(a_counts, b_counts, a_weights, b_weights)
+        different_pairs = np.bincount(pair_of_row, weights=different_rows, minlength=len(state_pairs)) > 0
+        return [bool(d) for d in different_pairs]
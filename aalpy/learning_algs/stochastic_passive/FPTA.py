@@ -1,20 +1,34 @@
 from functools import total_ordering
+from random import getrandbits, random, seed
+
+from aalpy.utils.DataHandler import EncodedTraces
 
 
 @total_ordering
 class AlergiaPtaNode:
     __slots__ = ['prefix', 'output', 'input_frequency', 'children', 'original_input_frequency',
-                 'original_children', 'state_id', 'children_prob']
+                 'original_children', 'state_id', 'children_prob', 'input_totals', 'output_frequencies',
+                 'original_input_totals', 'original_output_frequencies', 'sample_weight']
 
     def __init__(self, output, prefix):
         self.prefix = prefix
         self.output = output
-        # mutable values
-        self.input_frequency = dict()
-        self.children = dict()
         # immutable values used for statistical computability check
         self.original_input_frequency = dict()
         self.original_children = dict()
+        # mutable values, same objects as the immutable ones until the node is changed by merging
+        self.input_frequency = self.original_input_frequency
+        self.children = self.original_children
+        # per-input aggregates of (input, output) frequencies (not used for Markov chains)
+        # input -> sum of frequencies, and input -> {output: frequency}
+        # computed on first lookup, input_totals are reset to None whenever the underlying frequencies change
+        self.input_totals = None
+        self.output_frequencies = None
+        self.original_input_totals = None
+        self.original_output_frequencies = None
+        # frequencies of nodes below the sampling depth are estimated from a sample of sequences, each sampled
+        # sequence increases them by sample_weight (1 / sampling rate)
+        self.sample_weight = 1
         # # for visualization
         self.state_id = None
         self.children_prob = None
@@ -22,23 +36,78 @@ class AlergiaPtaNode:
     def successors(self):
         return list(self.children.values())
 
+    def make_mutable(self):
+        """
+        Copies immutable children and frequencies, so that mutable values can be changed by merging.
+        """
+        if self.children is self.original_children:
+            self.children = dict(self.original_children)
+        if self.input_frequency is self.original_input_frequency:
+            self.input_frequency = dict(self.original_input_frequency)
+            self.input_totals, self.output_frequencies = None, None
+
+    def reset(self):
+        """
+        Restores mutable values to the immutable ones.
+        """
+        self.children = self.original_children
+        self.input_frequency = self.original_input_frequency
+        self.input_totals, self.output_frequencies = None, None
+
+    def add_frequency(self, io, freq):
+        """
+        Increases the mutable frequency of the (input, output) pair.
+        """
+        if self.input_frequency is self.original_input_frequency:
+            self.input_frequency = dict(self.original_input_frequency)
+        self.input_frequency[io] = self.input_frequency.get(io, 0) + freq
+        self.input_totals, self.output_frequencies = None, None
+
+    @staticmethod
+    def _aggregate(input_frequency):
+        input_totals, output_frequencies = dict(), dict()
+        for (i, o), freq in input_frequency.items():
+            input_totals[i] = input_totals.get(i, 0) + freq
+            output_frequencies.setdefault(i, dict())[o] = freq
+        return input_totals, output_frequencies
+
+    def _update_aggregates(self):
+        if self.original_input_totals is None:
+            self.original_input_totals, self.original_output_frequencies = \
+                self._aggregate(self.original_input_frequency)
+        if self.input_frequency is self.original_input_frequency:
+            self.input_totals, self.output_frequencies = self.original_input_totals, self.original_output_frequencies
+        elif self.input_totals is None:
+            self.input_totals, self.output_frequencies = self._aggregate(self.input_frequency)
+
+    # returned output frequencies are the dictionaries stored in the node and should not be modified
+
     def get_inputs(self):
-        return {i for i, _ in self.input_frequency.keys()}
+        self._update_aggregates()
+        return set(self.input_totals.keys())
 
     def get_input_frequency(self, target_input):
-        return sum(freq for (i, _), freq in self.input_frequency.items() if i == target_input)
+        self._update_aggregates()
+        return self.input_totals.get(target_input, 0)
 
     def get_output_frequencies(self, target_input):
-        return {o: freq for (i, o), freq in self.input_frequency.items() if i == target_input}
+        self._update_aggregates()
+        return self.output_frequencies.get(target_input, dict())
 
     def get_immutable_inputs(self):
-        return {i for i, _ in self.original_children.keys()}
+        if self.original_input_totals is None:
+            self._update_aggregates()
+        return set(self.original_input_totals.keys())
 
     def get_immutable_input_frequency(self, target_input):
-        return sum(freq for (i, _), freq in self.original_input_frequency.items() if i == target_input)
+        if self.original_input_totals is None:
+            self._update_aggregates()
+        return self.original_input_totals.get(target_input, 0)
 
     def get_original_output_frequencies(self, target_input):
-        return {o: freq for (i, o), freq in self.original_input_frequency.items() if i == target_input}
+        if self.original_input_totals is None:
+            self._update_aggregates()
+        return self.original_output_frequencies.get(target_input, dict())
 
     def __lt__(self, other):
         return (len(self.prefix), self.prefix) < (len(other.prefix), other.prefix)
@@ -50,39 +119,161 @@ class AlergiaPtaNode:
         return self.prefix == other.prefix
 
 
-def create_fpta(data, automaton_type):
-    # in case of SMM, there is no initial input
-    seq_iter_index = 0 if automaton_type == 'smm' else 1
-
-    initial_output = None if automaton_type == 'smm' else data[0][0]
+def create_fpta(data, automaton_type, num_processes=1, sampling_depth=None, sampling_rate=1.):
+    """
+    Creates the FPTA from data, given either as a list of sequences or as EncodedTraces. If num_processes is greater
+    than 1, data is split into shards whose FPTAs are constructed in parallel processes and then summed into a
+    single FPTA. For sampling_depth and sampling_rate see add_sequence_to_fpta.
+    """
+    initial_output = _get_initial_output(data, automaton_type)
 
     root_node = AlergiaPtaNode(initial_output, ())
 
-    for seq in data:
-        if automaton_type != 'smm' and seq[0] != root_node.output:
+    if num_processes > 1 and len(data) > 1:
+        from multiprocessing import Pool
+
+        shard_size = -(-len(data) // num_processes)
+        shards = [data[i:i + shard_size] for i in range(0, len(data), shard_size)]
+        # each shard is checked against its first sequence, so first sequences are checked here
+        if any(_get_initial_output(shard, automaton_type) != initial_output for shard in shards):
             print('All sequances passed to Alergia should have the same initial output!')
             assert False
 
-        curr_node = root_node
+        with Pool(len(shards)) as pool:
+            # each shard is sampled with its own seed drawn from the global random generator, otherwise forked
+            # processes would sample identical sequences
+            shard_args = [(shard, automaton_type, sampling_depth, sampling_rate,
+                           getrandbits(64) if sampling_depth is not None else None) for shard in shards]
+            # shards are summed in the order of data, so that children of each node are in the same order as in
+            # the FPTA constructed sequentially
+            for encoded_fpta in pool.starmap(_create_encoded_fpta, shard_args):
+                add_encoded_fpta(root_node, encoded_fpta, automaton_type, sampling_depth, 1 / sampling_rate)
+        return root_node
+
+    sequences = data.alergia_sequences(automaton_type) if isinstance(data, EncodedTraces) else data
+    for seq in sequences:
+        add_sequence_to_fpta(root_node, seq, automaton_type, sampling_depth=sampling_depth,
+                             sampling_rate=sampling_rate)
+
+    return root_node
+
+
+def _get_initial_output(data, automaton_type):
+    if automaton_type == 'smm':
+        return None
+    if isinstance(data, EncodedTraces):
+        return next(data[0:1].alergia_sequences(automaton_type))[0]
+    return data[0][0]
+
 
-        for el in seq[seq_iter_index:]:
-            if el not in curr_node.children:
-                out = None
-                if automaton_type == 'mc':
-                    out = el
-                elif automaton_type == 'mdp':
-                    out = el[1]
+def encode_fpta(root_node):
+    """
+    Encodes the immutable values of the FPTA as a flat list of (parent index, element, frequency) triples in
+    breadth-first order, where index 0 is the root and index k > 0 is the node reached by the k-th triple.
+    Unlike the linked nodes, the encoding can be pickled regardless of the depth of the FPTA.
+    """
+    encoded_fpta = []
+    nodes = [root_node]
+    for parent_index, node in enumerate(nodes):
+        for el, child in node.original_children.items():
+            encoded_fpta.append((parent_index, el, node.original_input_frequency[el]))
+            nodes.append(child)
+    return encoded_fpta
 
-                reached_node = AlergiaPtaNode(out, curr_node.prefix + (el,))
+
+def add_encoded_fpta(root_node, encoded_fpta, automaton_type, sampling_depth=None, sample_weight=1):
+    """
+    Adds the frequencies of an encoded FPTA to the FPTA rooted in root_node, node by node. If the encoded FPTA was
+    constructed with a sampling depth, its sample_weight is assigned to nodes below that depth.
+    """
+    nodes = [root_node]
+    for parent_index, el, freq in encoded_fpta:
+        parent = nodes[parent_index]
+        if sampling_depth is not None and len(parent.prefix) >= sampling_depth:
+            parent.sample_weight = sample_weight
+        child = parent.original_children.get(el)
+        if child is None:
+            out = None
+            if automaton_type == 'mc':
+                out = el
+            elif automaton_type == 'mdp':
+                out = el[1]
+
+            child = AlergiaPtaNode(out, parent.prefix + (el,))
+            parent.original_children[el] = child
+            if parent.children is not parent.original_children:
+                parent.children[el] = child
+
+        frequencies = parent.original_input_frequency
+        frequencies[el] = frequencies.get(el, 0) + freq
+        parent.original_input_totals = None
+        if parent.input_frequency is not frequencies:
+            parent.input_frequency[el] = parent.input_frequency.get(el, 0) + freq
+            parent.input_totals = None
+
+        nodes.append(child)
+
+
+def _create_encoded_fpta(data, automaton_type, sampling_depth, sampling_rate, random_seed):
+    if random_seed is not None:
+        seed(random_seed)
+    return encode_fpta(create_fpta(data, automaton_type, sampling_depth=sampling_depth, sampling_rate=sampling_rate))
+
+
+def add_sequence_to_fpta(root_node, seq, automaton_type, updated_nodes=None, sampling_depth=None, sampling_rate=1.):
+    """
+    Adds a sequence to the FPTA, increasing both mutable and immutable frequencies along its path.
+    If updated_nodes set is passed, ids of all nodes whose frequencies were increased are added to it.
+    If sampling_depth is set, steps starting in nodes at or below that depth are added only for a random
+    sampling_rate fraction of sequences, and increase frequencies by 1 / sampling_rate. Exact frequencies are kept
+    near the root, while the number of deep, rarely visited nodes is reduced.
+    """
+    # in case of SMM, there is no initial input
+    seq_iter_index = 0 if automaton_type == 'smm' else 1
+
+    if automaton_type != 'smm' and seq[0] != root_node.output:
+        print('All sequances passed to Alergia should have the same initial output!')
+        assert False
+
+    if sampling_depth is None or len(seq) - seq_iter_index <= sampling_depth:
+        _add_steps(root_node, seq[seq_iter_index:], automaton_type, 1, updated_nodes)
+        return
+
+    last_exact_node = _add_steps(root_node, seq[seq_iter_index:seq_iter_index + sampling_depth], automaton_type, 1,
+                                 updated_nodes)
+    if random() < sampling_rate:
+        sample_weight = 1 / sampling_rate
+        _add_steps(last_exact_node, seq[seq_iter_index + sampling_depth:], automaton_type, sample_weight,
+                   updated_nodes, sample_weight)
+
+
+def _add_steps(curr_node, steps, automaton_type, freq, updated_nodes, sample_weight=None):
+    for el in steps:
+        reached_node = curr_node.original_children.get(el)
+        if reached_node is None:
+            out = None
+            if automaton_type == 'mc':
+                out = el
+            elif automaton_type == 'mdp':
+                out = el[1]
+
+            reached_node = AlergiaPtaNode(out, curr_node.prefix + (el,))
+            curr_node.original_children[el] = reached_node
+            if curr_node.children is not curr_node.original_children:
                 curr_node.children[el] = reached_node
-                curr_node.original_children[el] = reached_node
 
-                curr_node.input_frequency[el] = 0
-                curr_node.original_input_frequency[el] = 0
+        frequencies = curr_node.original_input_frequency
+        frequencies[el] = frequencies.get(el, 0) + freq
+        curr_node.original_input_totals = None
+        if curr_node.input_frequency is not frequencies:
+            curr_node.input_frequency[el] = curr_node.input_frequency.get(el, 0) + freq
+            curr_node.input_totals = None
 
-            curr_node.input_frequency[el] += 1
-            curr_node.original_input_frequency[el] += 1
+        if sample_weight is not None:
+            curr_node.sample_weight = sample_weight
+        if updated_nodes is not None:
+            updated_nodes.add(id(curr_node))
 
-            curr_node = curr_node.children[el]
+        curr_node = reached_node
 
-    return root_node
+    return curr_node
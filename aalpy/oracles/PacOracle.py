@@ -13,9 +13,10 @@ class PacOracle(Oracle):
     Queries are of random length in a predefined range.
     """
 
-    def __init__(self, alphabet: list, sul: SUL, epsilon=0.01, delta=0.01, min_walk_len=10, max_walk_len=25):
+    def __init__(self, alphabet: list, sul: SUL, epsilon=0.01, delta=0.01, min_walk_len=10, max_walk_len=25,
+                 num_processes=1):
 
-        super().__init__(alphabet, sul)
+        super().__init__(alphabet, sul, num_processes)
         self.min_walk_len = min_walk_len
         self.max_walk_len = max_walk_len
         self.epsilon = epsilon
@@ -26,21 +27,6 @@ class PacOracle(Oracle):
         self.round += 1
         num_test_cases = 1 / self.epsilon * (log(1 / self.delta) + self.round * log(2))
 
-        for i in range(ceil(num_test_cases)):
-            inputs = []
-            self.reset_hyp_and_sul(hypothesis)
-
-            num_steps = randint(self.min_walk_len, self.max_walk_len)
-
-            for _ in range(num_steps):
-                inputs.append(choice(self.alphabet))
-
-                out_sul = self.sul.step(inputs[-1])
-                out_hyp = hypothesis.step(inputs[-1])
-                self.num_steps += 1
-
-                if out_sul != out_hyp:
-                    self.sul.post()
-                    return inputs
-
-        return None
+        test_suite = (tuple(choice(self.alphabet) for _ in range(randint(self.min_walk_len, self.max_walk_len)))
+                      for _ in range(ceil(num_test_cases)))
+        return self.execute_test_suite(hypothesis, test_suite)
@@ -0,0 +1,230 @@
+import os
+import signal
+from random import getrandbits, seed
+from statistics import mean
+from time import time
+
+from aalpy.base import Oracle, SUL
+
+# lower bound of mean times to counterexample (in seconds) used in allocation, avoids division by zero
+min_cex_time = 1e-3
+
+
+class PortfolioEqOracle(Oracle):
+    """
+    Equivalence oracle that races several equivalence oracles. In each call of find_cex, all oracles search for a
+    counterexample concurrently, each in its own process and on its own replica of the SUL. The first counterexample
+    that is found is returned and the search of other oracles is cancelled. If no oracle finds a counterexample,
+    None is returned once all of them are done.
+
+    Oracles that find counterexamples first, and find them faster, are given more processes in later rounds, which they
+    use to execute their test cases in parallel (see Oracle.execute_test_suite).
+
+    Oracles are cancelled by killing the process groups of their processes, and their state is sent back from forked
+    processes. If the start method of multiprocessing is not 'fork' (e.g. 'spawn', the default on Windows and macOS),
+    or process groups are not supported, oracles search one after another instead, each with all processes.
+    """
+
+    def __init__(self, alphabet: list, sul: SUL, oracles: list, num_processes=None):
+        """
+        Args:
+
+            alphabet: input alphabet
+
+            sul: system under learning, replicated for each oracle (oracles use it instead of the SULs they were
+                created with during find_cex)
+
+            oracles: list of equivalence oracles
+
+            num_processes: total number of processes shared by the oracles, at least one per oracle. If None, the
+                number of CPUs is used
+        """
+
+        super().__init__(alphabet, sul)
+        assert oracles
+        self.oracles = oracles
+        self.num_processes = max(num_processes or os.cpu_count() or 1, len(oracles))
+        assert self.num_processes >= len(oracles)
+
+        # oracle index -> number of rounds in which the oracle found a counterexample first
+        self.num_cex = [0] * len(oracles)
+        # oracle index -> times (in seconds) in which the oracle found its counterexamples
+        self.cex_times = [[] for _ in oracles]
+
+    def allocate_processes(self):
+        """
+        Distributes processes among oracles. Each oracle gets one process, remaining processes are distributed
+        proportionally to the number of counterexamples each oracle has found first (plus one), divided by the mean
+        time in which it found them. Oracles that have not found any counterexample are assumed to take the mean
+        time of all counterexamples.
+
+        Returns:
+
+            list containing the number of processes of each oracle
+        """
+        all_times = [cex_time for times in self.cex_times for cex_time in times]
+        default_time = mean(all_times) if all_times else 1
+        weights = [(num_cex + 1) / max(mean(times) if times else default_time, min_cex_time)
+                   for num_cex, times in zip(self.num_cex, self.cex_times)]
+        num_extra_processes = self.num_processes - len(self.oracles)
+
+        allocation = [1 + int(num_extra_processes * w / sum(weights)) for w in weights]
+        # processes lost by rounding down are given to the oracles with the largest weights
+        for index in sorted(range(len(weights)), key=lambda i: weights[i], reverse=True):
+            if sum(allocation) == self.num_processes:
+                break
+            allocation[index] += 1
+
+        return allocation
+
+    def find_cex(self, hypothesis):
+        from multiprocessing import get_start_method
+
+        race = get_start_method() == 'fork' and hasattr(os, 'setpgrp')
+        allocation = self.allocate_processes()
+
+        # oracles search on the SUL of the portfolio with their allocated processes, their own SULs and numbers of
+        # processes are restored once the search is done
+        member_setup = [(oracle.sul, oracle.num_processes) for oracle in self.oracles]
+        try:
+            for oracle, num_processes in zip(self.oracles, allocation):
+                oracle.sul = self.sul
+                oracle.num_processes = num_processes if race else self.num_processes
+            if race:
+                cex, winner_index, winner_time = self._race_oracles(hypothesis)
+            else:
+                # oracles that were allocated the most processes search first
+                order = sorted(range(len(self.oracles)), key=lambda i: allocation[i], reverse=True)
+                cex, winner_index, winner_time = self._run_oracles_in_sequence(hypothesis, order)
+        finally:
+            for oracle, (sul, num_processes) in zip(self.oracles, member_setup):
+                oracle.sul, oracle.num_processes = sul, num_processes
+
+        if cex is not None:
+            self.num_cex[winner_index] += 1
+            self.cex_times[winner_index].append(winner_time)
+
+        return cex
+
+    def _race_oracles(self, hypothesis):
+        """
+        Runs find_cex of all oracles concurrently, each in its own process.
+
+        Args:
+
+            hypothesis: current hypothesis
+
+        Returns:
+
+            counterexample (None if no oracle finds one), index of the oracle that found it and its search time
+        """
+        from multiprocessing import Pipe, Process
+        from multiprocessing.connection import wait
+
+        connections = dict()
+        processes = []
+        cex, winner_index, winner_time = None, None, None
+        try:
+            for index, oracle in enumerate(self.oracles):
+                receiver, sender = Pipe(duplex=False)
+                connections[receiver] = index
+                # each process samples with its own seed drawn from the global random generator, otherwise forked
+                # processes would generate identical test cases in each round
+                process = Process(target=_find_member_cex, args=(oracle, hypothesis, sender, getrandbits(64)))
+                process.start()
+                sender.close()
+                processes.append(process)
+
+            while connections and cex is None:
+                for receiver in wait(list(connections.keys())):
+                    index = connections.pop(receiver)
+                    try:
+                        member_cex, search_time, state, error = receiver.recv()
+                    except EOFError:
+                        raise RuntimeError(f'Process of oracle {self.oracles[index]} terminated unexpectedly.')
+                    finally:
+                        receiver.close()
+                    if error is not None:
+                        raise error
+
+                    oracle = self.oracles[index]
+                    if state is not None:
+                        self.num_queries += state['num_queries'] - oracle.num_queries
+                        self.num_steps += state['num_steps'] - oracle.num_steps
+                        oracle.__dict__.update(state)
+
+                    # if several oracles are done at once, the shortest counterexample is kept
+                    if member_cex is not None and (cex is None or len(member_cex) < len(cex)):
+                        cex, winner_index, winner_time = member_cex, index, search_time
+        finally:
+            # oracles that are still searching are cancelled
+            for process in processes:
+                _kill_member_process(process)
+            for process in processes:
+                process.join()
+            for receiver in connections.keys():
+                receiver.close()
+
+        return cex, winner_index, winner_time
+
+    def _run_oracles_in_sequence(self, hypothesis, order):
+        """
+        Runs find_cex of oracles one after another in the main process, until one of them finds a counterexample.
+
+        Args:
+
+            hypothesis: current hypothesis
+
+            order: indices of oracles in the order in which they search
+
+        Returns:
+
+            counterexample (None if no oracle finds one), index of the oracle that found it and its search time
+        """
+        for index in order:
+            oracle = self.oracles[index]
+            num_queries, num_steps = oracle.num_queries, oracle.num_steps
+
+            start_time = time()
+            cex = oracle.find_cex(hypothesis)
+            search_time = time() - start_time
+
+            self.num_queries += oracle.num_queries - num_queries
+            self.num_steps += oracle.num_steps - num_steps
+            if cex is not None:
+                return cex, index, search_time
+
+        return None, None, None
+
+
+def _kill_member_process(process):
+    process.kill()
+    # processes started by the oracle (see Oracle.execute_test_suite) are in the process group of its process
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def _find_member_cex(oracle, hypothesis, sender, random_seed):
+    # the process becomes the leader of a new process group, so that it can be killed together with its processes
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    seed(random_seed)
+
+    start_time = time()
+    try:
+        cex = oracle.find_cex(hypothesis)
+    except Exception as e:
+        sender.send((None, time() - start_time, None, e))
+        return
+    search_time = time() - start_time
+
+    # state of the oracle (e.g. frequencies of tested states) is returned to the main process, unless it cannot be
+    # pickled
+    state = {k: v for k, v in oracle.__dict__.items() if k != 'sul'}
+    try:
+        sender.send((cex, search_time, state, None))
+    except Exception:
+        sender.send((cex, search_time, None, None))
@@ -13,7 +13,7 @@ class RandomWordEqOracle(Oracle):
     """
 
     def __init__(self, alphabet: list, sul: SUL, num_walks=500, min_walk_len=10, max_walk_len=30,
-                 reset_after_cex=True):
+                 reset_after_cex=True, num_processes=1):
         """
         Args:
             alphabet: input alphabet
@@ -28,9 +28,12 @@ class RandomWordEqOracle(Oracle):
 
             reset_after_cex: if True, num_walks will be preformed after every counter example, else the total number
                 or walks will equal to num_walks
+
+            num_processes: number of processes in which walks on deterministic hypotheses are executed, each on its
+                own replica of the SUL
         """
 
-        super().__init__(alphabet, sul)
+        super().__init__(alphabet, sul, num_processes)
         self.num_walks = num_walks
         self.min_walk_len = min_walk_len
         self.max_walk_len = max_walk_len
@@ -44,6 +47,23 @@ class RandomWordEqOracle(Oracle):
         if not self.automata_type:
             self.automata_type = automaton_dict.get(type(hypothesis), 'det')
 
+        if self.automata_type == 'det':
+            num_queries = self.num_queries
+            cex = self.execute_test_suite(hypothesis, self.generate_walks())
+            if cex is None:
+                self.walk_lengths.clear()
+                self.num_walks_done = self.num_walks
+            elif self.reset_after_cex:
+                self.walk_lengths = [randint(self.min_walk_len, self.max_walk_len) for _ in range(self.num_walks)]
+                self.num_walks_done = 0
+            else:
+                # walks generated for test cases that were cancelled once the counterexample was found are not
+                # counted, each executed walk is a query (unless it is a prefix of another walk)
+                num_walks_executed = min(self.num_queries - num_queries, len(self.walk_lengths))
+                del self.walk_lengths[:num_walks_executed]
+                self.num_walks_done += num_walks_executed
+            return cex
+
         while self.num_walks_done < self.num_walks:
             inputs = []
             outputs = []
@@ -56,23 +76,12 @@ class RandomWordEqOracle(Oracle):
                 inputs.append(choice(self.alphabet))
 
                 out_sul = self.sul.step(inputs[-1])
-                if self.automata_type == 'det':
-                    out_hyp = hypothesis.step(inputs[-1])
-                else:
-                    out_hyp = hypothesis.step_to(inputs[-1], out_sul)
-                    outputs.append(out_sul)
+                out_hyp = hypothesis.step_to(inputs[-1], out_sul)
+                outputs.append(out_sul)
 
                 self.num_steps += 1
 
-                if self.automata_type == 'det' and out_sul != out_hyp:
-                    if self.reset_after_cex:
-                        self.walk_lengths = [randint(self.min_walk_len, self.max_walk_len) for _ in range(self.num_walks)]
-                        self.num_walks_done = 0
-
-                    self.sul.post()
-                    return inputs
-
-                elif out_hyp is None:
+                if out_hyp is None:
                     self.sul.post()
 
                     if self.reset_after_cex:
@@ -90,6 +99,11 @@ class RandomWordEqOracle(Oracle):
 
         return None
 
+    def generate_walks(self):
+        # lengths of walks are removed from walk_lengths in find_cex, once the walks are executed
+        for walk_len in self.walk_lengths:
+            yield tuple(choice(self.alphabet) for _ in range(walk_len))
+
     def reset_counter(self):
         if self.reset_after_cex:
             self.num_walks_done = 0
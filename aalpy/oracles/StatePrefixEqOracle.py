@@ -12,7 +12,7 @@ class StatePrefixEqOracle(Oracle):
     rand_walk_len exactly walk_per_state times during learning. Therefore excessive testing of initial states is
     avoided.
     """
-    def __init__(self, alphabet: list, sul: SUL, walks_per_state=10, walk_len=12, depth_first=False):
+    def __init__(self, alphabet: list, sul: SUL, walks_per_state=10, walk_len=12, depth_first=False, num_processes=1):
         """
         Args:
 
@@ -25,9 +25,11 @@ class StatePrefixEqOracle(Oracle):
             walk_len:length of random walk
 
             depth_first:first explore newest states
+
+            num_processes: number of processes in which walks are executed, each on its own replica of the SUL
         """
 
-        super().__init__(alphabet, sul)
+        super().__init__(alphabet, sul, num_processes)
         self.walks_per_state = walks_per_state
         self.steps_per_walk = walk_len
         self.depth_first = depth_first
@@ -52,27 +54,9 @@ class StatePrefixEqOracle(Oracle):
         else:
             random.shuffle(states_to_cover)
 
-        for state in states_to_cover:
-            self.freq_dict[state.prefix] = self.freq_dict[state.prefix] + 1
-
-            self.reset_hyp_and_sul(hypothesis)
-
-            prefix = state.prefix
-            for p in prefix:
-                hypothesis.step(p)
-                self.sul.step(p)
-                self.num_steps += 1
-
-            suffix = ()
-            for _ in range(self.steps_per_walk):
-                suffix += (random.choice(self.alphabet),)
-
-                out_sul = self.sul.step(suffix[-1])
-                out_hyp = hypothesis.step(suffix[-1])
-                self.num_steps += 1
-
-                if out_sul != out_hyp:
-                    self.sul.post()
-                    return prefix + suffix
+        def test_suite():
+            for state in states_to_cover:
+                self.freq_dict[state.prefix] = self.freq_dict[state.prefix] + 1
+                yield state.prefix + tuple(random.choice(self.alphabet) for _ in range(self.steps_per_walk))
 
-        return None
+        return self.execute_test_suite(hypothesis, test_suite(), batch_size=self.walks_per_state)
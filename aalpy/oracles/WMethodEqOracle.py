@@ -1,3 +1,4 @@
+from collections import defaultdict
 from itertools import product
 from random import shuffle, choice, randint
 
@@ -10,7 +11,7 @@ class WMethodEqOracle(Oracle):
     Equivalence oracle based on characterization set/ W-set. From 'Tsun S. Chow.   Testing software design modeled by
     finite-state machines'.
     """
-    def __init__(self, alphabet: list, sul: SUL, max_number_of_states, shuffle_test_set=True):
+    def __init__(self, alphabet: list, sul: SUL, max_number_of_states, shuffle_test_set=True, num_processes=1):
         """
         Args:
 
@@ -18,12 +19,12 @@ class WMethodEqOracle(Oracle):
             sul: system under learning
             max_number_of_states: maximum number of states in the automaton
             shuffle_test_set: if True, test cases will be shuffled
+            num_processes: number of processes in which test cases are executed, each on its own replica of the SUL
         """
 
-        super().__init__(alphabet, sul)
+        super().__init__(alphabet, sul, num_processes)
         self.m = max_number_of_states
         self.shuffle = shuffle_test_set
-        self.cache = set()
 
     def find_cex(self, hypothesis):
 
@@ -37,25 +38,10 @@ class WMethodEqOracle(Oracle):
         for i in range(self.m + 1 - len(hypothesis.states)):
             middle.extend(list(product(self.alphabet, repeat=i)))
 
-        for seq in product(transition_cover, middle, hypothesis.characterization_set):
-            inp_seq = tuple([i for sub in seq for i in sub])
-            if inp_seq not in self.cache:
-                self.reset_hyp_and_sul(hypothesis)
-                outputs = []
+        test_suite = (tuple([i for sub in seq for i in sub])
+                      for seq in product(transition_cover, middle, hypothesis.characterization_set))
 
-                for ind, letter in enumerate(inp_seq):
-                    out_hyp = hypothesis.step(letter)
-                    out_sul = self.sul.step(letter)
-                    self.num_steps += 1
-
-                    outputs.append(out_sul)
-                    if out_hyp != out_sul:
-                        self.sul.post()
-                        return inp_seq[:ind + 1]
-                self.cache.add(inp_seq)
-            
-
-        return None
+        return self.execute_test_suite(hypothesis, test_suite)
 
 
 class RandomWMethodEqOracle(Oracle):
@@ -64,7 +50,7 @@ class RandomWMethodEqOracle(Oracle):
     Random walks stem from fixed prefix (path to the state). At the end of the random
     walk an element from the characterization set is added to the test case.
     """
-    def __init__(self, alphabet: list, sul: SUL, walks_per_state=12, walk_len=12):
+    def __init__(self, alphabet: list, sul: SUL, walks_per_state=12, walk_len=12, num_processes=1):
         """
         Args:
 
@@ -75,9 +61,11 @@ class RandomWMethodEqOracle(Oracle):
             walks_per_state: number of random walks that should start from each state
 
             walk_len: length of random walk
+
+            num_processes: number of processes in which walks are executed, each on its own replica of the SUL
         """
 
-        super().__init__(alphabet, sul)
+        super().__init__(alphabet, sul, num_processes)
         self.walks_per_state = walks_per_state
         self.random_walk_len = walk_len
         self.freq_dict = dict()
@@ -101,23 +89,302 @@ class RandomWMethodEqOracle(Oracle):
 
         shuffle(states_to_cover)
 
-        for state in states_to_cover:
-            self.freq_dict[state.prefix] = self.freq_dict[state.prefix] + 1
+        def test_suite():
+            for state in states_to_cover:
+                self.freq_dict[state.prefix] = self.freq_dict[state.prefix] + 1
+
+                prefix = state.prefix
+                random_walk = tuple(choice(self.alphabet) for _ in range(randint(1, self.random_walk_len)))
+
+                yield prefix + random_walk + choice(hypothesis.characterization_set)
+
+        # walks are counted when they are generated, so small batches are used to count few walks that are not
+        # executed because a counterexample was found
+        return self.execute_test_suite(hypothesis, test_suite(), batch_size=self.walks_per_state)
+
+
+def _get_identification_sets(hypothesis, harmonized=False):
+    """
+    Computes a state identification set for each state of the hypothesis from its characterization set. The
+    identification set of a state contains sequences of the characterization set that distinguish it from all other
+    states. If harmonized is True, each pair of states shares a sequence distinguishing them (HSI-method), otherwise
+    sets are computed by a greedy set cover (Wp-method).
+
+    Args:
+
+        hypothesis: current hypothesis, whose characterization_set is set
+
+        harmonized: if True, harmonized state identifiers are computed
+
+    Returns:
+
+        dictionary mapping states to their identification sets
+    """
+    char_set = sorted(set(hypothesis.characterization_set), key=len)
+    char_set_index = {seq: seq_index for seq_index, seq in enumerate(char_set)}
+    responses = _get_output_responses(hypothesis, char_set)
+
+    # if states are distinguished only by their outputs, the empty sequence is their identifier
+    empty_seq = [()] if () in char_set else []
+    identification_sets = {state: [] for state in hypothesis.states}
+
+    if harmonized:
+        for ind, state in enumerate(hypothesis.states):
+            for other_state in hypothesis.states[ind + 1:]:
+                state_responses, other_responses = responses[state], responses[other_state]
+                other_identification_set = identification_sets[other_state]
+                if any(seq in other_identification_set and
+                       state_responses[char_set_index[seq]] != other_responses[char_set_index[seq]]
+                       for seq in identification_sets[state]):
+                    continue
+                distinguishing_seq = next((seq for seq, out, other_out in
+                                           zip(char_set, state_responses, other_responses) if out != other_out),
+                                          None)
+                for seq in [distinguishing_seq] if distinguishing_seq is not None else empty_seq:
+                    if seq not in identification_sets[state]:
+                        identification_sets[state].append(seq)
+                    if seq not in other_identification_set:
+                        other_identification_set.append(seq)
+        return _fill_empty_identification_sets(identification_sets)
+
+    # sequence index -> response -> states with that response
+    response_groups = [defaultdict(set) for _ in char_set]
+    for state in hypothesis.states:
+        for seq_index, response in enumerate(responses[state]):
+            response_groups[seq_index][response].add(state)
+
+    for state in hypothesis.states:
+        # states not yet distinguished from state
+        remaining = set(hypothesis.states)
+        remaining.remove(state)
+        while remaining:
+            not_distinguished = [remaining & response_groups[seq_index][response]
+                                 for seq_index, response in enumerate(responses[state])]
+            best_index = min(range(len(char_set)), key=lambda seq_index: len(not_distinguished[seq_index]))
+            if len(not_distinguished[best_index]) == len(remaining):
+                identification_sets[state].extend(empty_seq)
+                break
+            identification_sets[state].append(char_set[best_index])
+            remaining = not_distinguished[best_index]
+
+    return _fill_empty_identification_sets(identification_sets)
+
+
+def _get_output_responses(hypothesis, sequences):
+    # state -> list of output responses to sequences, computed on compiled transition tables if possible
+    if not hypothesis.is_input_complete():
+        return {state: [tuple(hypothesis.compute_output_seq(state, seq)) for seq in sequences]
+                for state in hypothesis.states}
+
+    compiled = hypothesis.compile()
+    # responses to the empty sequence are state outputs in case of DFAs and Moore machines
+    return {state: [tuple(compiled.run(seq, compiled.state_index[state]) if seq else
+                          hypothesis.compute_output_seq(state, seq)) for seq in sequences]
+            for state in hypothesis.states}
+
+
+def _fill_empty_identification_sets(identification_sets):
+    # transitions into states without identification sequences (e.g. single state hypothesis) are still tested
+    for state, identification_set in identification_sets.items():
+        if not identification_set:
+            identification_set.append(())
+    return identification_sets
+
+
+def _prepare_hypothesis(hypothesis):
+    if not hypothesis.characterization_set:
+        hypothesis.characterization_set = hypothesis.compute_characterization_set()
+        # fix for non-minimal intermediate hypothesis that can occur in KV
+        if not hypothesis.characterization_set:
+            hypothesis.characterization_set = [(a,) for a in hypothesis.get_input_alphabet()]
+
+    for state in hypothesis.states:
+        if state.prefix is None:
+            state.prefix = hypothesis.get_shortest_path(hypothesis.initial_state, state)
+
+
+def _get_reached_state(state, seq):
+    # None is returned if the hypothesis is input incomplete and seq leads to an undefined transition
+    for letter in seq:
+        state = state.transitions.get(letter)
+        if state is None:
+            return None
+    return state
+
+
+class WpMethodEqOracle(Oracle):
+    """
+    Equivalence oracle based on the partial W-method (Wp-method). From 'S. Fujiwara, G. v. Bochmann, F. Khendek,
+    M. Amalou, A. Ghedamsi. Test selection based on finite state models'.
+    The state cover is extended with middle sequences and the whole characterization set, whereas all other
+    transitions are only followed by the identification set of the state they reach. It gives the same guarantee as
+    the W-method with a smaller test set.
+    """
+    def __init__(self, alphabet: list, sul: SUL, max_number_of_states, shuffle_test_set=True, num_processes=1):
+        """
+        Args:
+
+            alphabet: input alphabet
+            sul: system under learning
+            max_number_of_states: maximum number of states in the automaton
+            shuffle_test_set: if True, order in which states and transitions are tested will be shuffled
+            num_processes: number of processes in which test cases are executed, each on its own replica of the SUL
+        """
+
+        super().__init__(alphabet, sul, num_processes)
+        self.m = max_number_of_states
+        self.shuffle = shuffle_test_set
+
+    def find_cex(self, hypothesis):
+
+        _prepare_hypothesis(hypothesis)
+        identification_sets = _get_identification_sets(hypothesis)
+
+        middle = []
+        for i in range(self.m + 1 - len(hypothesis.states)):
+            middle.extend(list(product(self.alphabet, repeat=i)))
+
+        state_cover = list(hypothesis.states)
+        # remaining transitions, given by their prefix and the state they lead to
+        state_cover_set = {state.prefix for state in state_cover}
+        transitions = [(state.prefix + (letter,), state.transitions[letter])
+                       for state in hypothesis.states for letter in self.alphabet
+                       if letter in state.transitions and state.prefix + (letter,) not in state_cover_set]
+
+        if self.shuffle:
+            shuffle(state_cover)
+            shuffle(transitions)
+
+        def test_set():
+            # state cover is tested with the whole characterization set
+            for state, mid, suffix in product(state_cover, middle, hypothesis.characterization_set):
+                # test cases leading to undefined transitions of input incomplete hypotheses are skipped
+                if _get_reached_state(state, mid + suffix) is not None:
+                    yield state.prefix + mid + suffix
+            # remaining transitions are tested with the identification set of the reached state
+            for prefix, target_state in transitions:
+                for mid in middle:
+                    reached_state = _get_reached_state(target_state, mid)
+                    if reached_state is None:
+                        continue
+                    for suffix in identification_sets[reached_state]:
+                        if _get_reached_state(reached_state, suffix) is not None:
+                            yield prefix + mid + suffix
+
+        return self.execute_test_suite(hypothesis, test_set())
+
+
+class HsiMethodEqOracle(Oracle):
+    """
+    Equivalence oracle based on the harmonized state identifiers (HSI-method). From 'A. Petrenko, N. Yevtushenko,
+    A. Lebedev, A. Das. Nondeterministic state machines in protocol conformance testing'.
+    Each transition cover sequence, extended with middle sequences, is followed by the harmonized identifier of the
+    reached state. Harmonized identifiers of every two states share a sequence distinguishing them, which gives the
+    same guarantee as the W-method without testing the whole characterization set.
+    """
+    def __init__(self, alphabet: list, sul: SUL, max_number_of_states, shuffle_test_set=True, num_processes=1):
+        """
+        Args:
+
+            alphabet: input alphabet
+            sul: system under learning
+            max_number_of_states: maximum number of states in the automaton
+            shuffle_test_set: if True, order in which states and transitions are tested will be shuffled
+            num_processes: number of processes in which test cases are executed, each on its own replica of the SUL
+        """
+
+        super().__init__(alphabet, sul, num_processes)
+        self.m = max_number_of_states
+        self.shuffle = shuffle_test_set
+
+    def find_cex(self, hypothesis):
+
+        _prepare_hypothesis(hypothesis)
+        identification_sets = _get_identification_sets(hypothesis, harmonized=True)
+
+        middle = []
+        for i in range(self.m + 1 - len(hypothesis.states)):
+            middle.extend(list(product(self.alphabet, repeat=i)))
+
+        # state cover and transition cover, given by their prefix and the state they lead to
+        prefixes = {state.prefix: state for state in hypothesis.states}
+        for state in hypothesis.states:
+            for letter in self.alphabet:
+                if letter in state.transitions:
+                    prefixes.setdefault(state.prefix + (letter,), state.transitions[letter])
+        prefixes = list(prefixes.items())
+
+        if self.shuffle:
+            shuffle(prefixes)
+
+        def test_set():
+            for prefix, target_state in prefixes:
+                for mid in middle:
+                    reached_state = _get_reached_state(target_state, mid)
+                    if reached_state is None:
+                        continue
+                    for suffix in identification_sets[reached_state]:
+                        if _get_reached_state(reached_state, suffix) is not None:
+                            yield prefix + mid + suffix
+
+        return self.execute_test_suite(hypothesis, test_set())
+
+
+class RandomWpMethodEqOracle(Oracle):
+    """
+    Randomized version of the Wp-Method equivalence oracle.
+    Random walks stem from fixed prefix (path to the state). At the end of the random
+    walk an element from the identification set of the reached state is added to the test case.
+    """
+    def __init__(self, alphabet: list, sul: SUL, walks_per_state=12, walk_len=12, num_processes=1):
+        """
+        Args:
+
+            alphabet: input alphabet
+
+            sul: system under learning
+
+            walks_per_state: number of random walks that should start from each state
+
+            walk_len: length of random walk
+
+            num_processes: number of processes in which walks are executed, each on its own replica of the SUL
+        """
+
+        super().__init__(alphabet, sul, num_processes)
+        self.walks_per_state = walks_per_state
+        self.random_walk_len = walk_len
+        self.freq_dict = dict()
+
+    def find_cex(self, hypothesis):
+
+        _prepare_hypothesis(hypothesis)
+        identification_sets = _get_identification_sets(hypothesis)
+
+        states_to_cover = []
+        for state in hypothesis.states:
+            if state.prefix not in self.freq_dict.keys():
+                self.freq_dict[state.prefix] = 0
 
-            self.reset_hyp_and_sul(hypothesis)
+            states_to_cover.extend([state] * (self.walks_per_state - self.freq_dict[state.prefix]))
 
-            prefix = state.prefix
-            random_walk = tuple(choice(self.alphabet) for _ in range(randint(1, self.random_walk_len)))
+        shuffle(states_to_cover)
 
-            test_case = prefix + random_walk + choice(hypothesis.characterization_set)
+        def test_suite():
+            for state in states_to_cover:
+                self.freq_dict[state.prefix] = self.freq_dict[state.prefix] + 1
 
-            for ind, i in enumerate(test_case):
-                output_hyp = hypothesis.step(i)
-                output_sul = self.sul.step(i)
-                self.num_steps += 1
+                prefix = state.prefix
+                random_walk = tuple(choice(self.alphabet) for _ in range(randint(1, self.random_walk_len)))
+                reached_state = _get_reached_state(state, random_walk)
+                if reached_state is None:
+                    continue
+                suffixes = [suffix for suffix in identification_sets[reached_state]
+                            if _get_reached_state(reached_state, suffix) is not None]
+                if not suffixes:
+                    continue
 
-                if output_sul != output_hyp:
-                    self.sul.post()
-                    return test_case[:ind + 1]
+                yield prefix + random_walk + choice(suffixes)
 
-        return None
+        # see RandomWMethodEqOracle for the batch size
+        return self.execute_test_suite(hypothesis, test_suite(), batch_size=self.walks_per_state)
@@ -7,7 +7,9 @@ from .RandomWordEqOracle import RandomWordEqOracle
 from .StatePrefixEqOracle import StatePrefixEqOracle
 from .TransitionFocusOracle import TransitionFocusOracle
 from .UserInputEqOracle import UserInputEqOracle
-from .WMethodEqOracle import RandomWMethodEqOracle, WMethodEqOracle
+from .WMethodEqOracle import RandomWMethodEqOracle, WMethodEqOracle, WpMethodEqOracle, HsiMethodEqOracle, \
+    RandomWpMethodEqOracle
 from .PacOracle import PacOracle
 from .ProvidedSequencesOracleWrapper import ProvidedSequencesOracleWrapper
 from .PerfectKnowledgeEqOracle import PerfectKnowledgeEqOracle
+from .PortfolioEqOracle import PortfolioEqOracle
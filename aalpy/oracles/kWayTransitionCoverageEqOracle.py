@@ -20,7 +20,8 @@ class KWayTransitionCoverageEqOracle(Oracle):
                  max_path_len: int = 50,
                  max_number_of_steps: int = 0,
                  optimize: str = 'steps',
-                 random_walk_len=10):
+                 random_walk_len=10,
+                 num_processes=1):
         """
         Args:
 
@@ -33,9 +34,10 @@ class KWayTransitionCoverageEqOracle(Oracle):
             max_number_of_steps: maximum number of steps that will be executed on the SUL (0 = no limit)
             optimize: minimize either the number of  'steps' or 'queries' that are executed
             random_walk_len: the number of steps that are added by 'prefix' generated paths
+            num_processes: number of processes in which paths are executed, each on its own replica of the SUL
 
         """
-        super().__init__(alphabet, sul)
+        super().__init__(alphabet, sul, num_processes)
         assert k >= 2
         assert method in ['random', 'prefix']
         assert optimize in ['steps', 'queries']
@@ -55,18 +57,10 @@ class KWayTransitionCoverageEqOracle(Oracle):
             paths = self.generate_random_paths(hypothesis) + self.cached_paths
             self.cached_paths = self.greedy_set_cover(hypothesis, paths)
 
-            for path in self.cached_paths:
-                counter_example = self.check_path(hypothesis, path.steps)
-
-                if counter_example is not None:
-                    return counter_example
+            return self.execute_test_suite(hypothesis, (path.steps for path in self.cached_paths))
 
         elif self.method == 'prefix':
-            for steps in self.generate_prefix_steps(hypothesis):
-                counter_example = self.check_path(hypothesis, steps)
-
-                if counter_example is not None:
-                    return counter_example
+            return self.execute_test_suite(hypothesis, self.generate_prefix_steps(hypothesis))
         return None
 
     def greedy_set_cover(self, hypothesis: Automaton, paths: list):
@@ -148,18 +142,3 @@ class KWayTransitionCoverageEqOracle(Oracle):
             transitions.add(transition)
 
         return Path(hypothesis.initial_state, end_states[-1], steps, transitions, transitions_log)
-
-    def check_path(self, hypothesis: Automaton, steps: tuple):
-        self.reset_hyp_and_sul(hypothesis)
-
-        for i, s in enumerate(steps):
-            out_sul = self.sul.step(s)
-            out_hyp = hypothesis.step(s)
-
-            self.num_steps += 1
-
-            if out_sul != out_hyp:
-                self.sul.post()
-                return steps[:i + 1]
-
-        return None
@@ -71,3 +71,140 @@ def try_int(x):
     if str.isdigit(x):
         return int(x)
     return x
+
+
+class EncodedTraces:
+    """
+    Traces encoded as integer arrays, that can be passed as data to Alergia and RPNI instead of lists of sequences.
+    Codes are translated to symbols with vocabularies while the FPTA (PTA) is constructed, and all occurrences of the
+    same symbol (or input/output pair) share a single Python object.
+
+    Traces are given either in the padded form, where the codes of the k-th trace are values[k, :lengths[k]] of a 2-D
+    array, or in the ragged form, where they are values[offsets[k]:offsets[k + 1]] of a 1-D array.
+
+    Codes of each trace are ordered as follows:
+        - Markov chains (Alergia 'mc'): O, O, O, ...
+        - MDPs (Alergia 'mdp'): O, I, O, I, O, ... (initial output followed by input/output pairs)
+        - stochastic Mealy machines (Alergia 'smm'): I, O, I, O, ...
+        - RPNI: I, I, I, ... and the code of the trace label in labels[k]
+
+    Requires NumPy.
+    """
+
+    def __init__(self, values, lengths=None, offsets=None, vocabulary=None, labels=None, label_vocabulary=None):
+        """
+        Args:
+
+            values: 2-D array of padded traces, or 1-D array of concatenated traces
+            lengths: lengths of traces, if traces are padded
+            offsets: offsets of traces (number of traces + 1 values), if traces are concatenated
+            vocabulary: list (or dict) mapping codes to symbols. If None, codes are used as symbols.
+            labels: codes of trace labels, only used by RPNI
+            label_vocabulary: list (or dict) mapping label codes to labels. If None, codes are used as labels.
+        """
+        import numpy as np
+
+        assert (lengths is None) != (offsets is None), 'Either lengths or offsets of traces have to be provided.'
+
+        self.values = np.asarray(values)
+        self.lengths = np.asarray(lengths) if lengths is not None else None
+        self.offsets = np.asarray(offsets) if offsets is not None else None
+        self.vocabulary = vocabulary
+        self.labels = np.asarray(labels) if labels is not None else None
+        self.label_vocabulary = label_vocabulary
+
+        assert self.values.ndim == (2 if self.lengths is not None else 1)
+
+    def __len__(self):
+        return len(self.lengths) if self.lengths is not None else len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        """
+        Returns the traces in the (contiguous) slice as EncodedTraces.
+        """
+        assert isinstance(index, slice) and index.step in {None, 1}, 'Only contiguous slices of traces are supported.'
+        start, stop, _ = index.indices(len(self))
+        stop = max(start, stop)
+
+        labels = self.labels[start:stop] if self.labels is not None else None
+        if self.lengths is not None:
+            return EncodedTraces(self.values[start:stop], lengths=self.lengths[start:stop],
+                                 vocabulary=self.vocabulary, labels=labels, label_vocabulary=self.label_vocabulary)
+
+        offsets = self.offsets[start:stop + 1]
+        return EncodedTraces(self.values[offsets[0]:offsets[-1]], offsets=offsets - offsets[0],
+                             vocabulary=self.vocabulary, labels=labels, label_vocabulary=self.label_vocabulary)
+
+    def get_lengths(self):
+        """
+        Returns the array of trace lengths (number of codes in each trace).
+        """
+        import numpy as np
+        return self.lengths if self.lengths is not None else np.diff(self.offsets)
+
+    def _get_codes(self, order=None):
+        # one list of codes per trace, no objects are created for codes that are cached small integers
+        indices = range(len(self)) if order is None else order
+        if self.lengths is not None:
+            lengths = self.lengths.tolist()
+            for k in indices:
+                yield self.values[k, :lengths[k]].tolist()
+        else:
+            offsets = self.offsets.tolist()
+            for k in indices:
+                yield self.values[offsets[k]:offsets[k + 1]].tolist()
+
+    @staticmethod
+    def _get_decoder(vocabulary):
+        return vocabulary.__getitem__ if vocabulary is not None else lambda code: code
+
+    def alergia_sequences(self, automaton_type):
+        """
+        Yields traces in the format of Alergia data, i.e. [O, (I, O), ...] for MDPs, [(I, O), ...] for stochastic Mealy
+        machines and [O, O, ...] for Markov chains.
+        """
+        decode = self._get_decoder(self.vocabulary)
+        # input code -> output code -> (input, output) pair
+        pairs = dict()
+
+        def get_pair(i, o):
+            outputs = pairs.get(i)
+            if outputs is None:
+                outputs = pairs[i] = dict()
+            pair = outputs.get(o)
+            if pair is None:
+                pair = outputs[o] = (decode(i), decode(o))
+            return pair
+
+        for codes in self._get_codes():
+            if automaton_type == 'mc':
+                yield [decode(c) for c in codes]
+            elif automaton_type == 'mdp':
+                yield [decode(codes[0])] + [get_pair(i, o) for i, o in zip(codes[1::2], codes[2::2])]
+            else:
+                yield [get_pair(i, o) for i, o in zip(codes[0::2], codes[1::2])]
+
+    def get_alergia_sequence_lengths(self, automaton_type):
+        """
+        Returns lengths of the traces in the format of Alergia data (see alergia_sequences).
+        """
+        lengths = self.get_lengths()
+        if automaton_type == 'mc':
+            return lengths
+        if automaton_type == 'mdp':
+            return (lengths - 1) // 2 + 1
+        return lengths // 2
+
+    def rpni_sequences(self):
+        """
+        Yields (input sequence, label) pairs in the format of RPNI data, sorted by the length of input sequences.
+        """
+        import numpy as np
+
+        assert self.labels is not None, 'Labels are required for RPNI data.'
+        decode, decode_label = self._get_decoder(self.vocabulary), self._get_decoder(self.label_vocabulary)
+        labels = self.labels.tolist()
+
+        order = np.argsort(self.get_lengths(), kind='stable').tolist()
+        for k, codes in zip(order, self._get_codes(order)):
+            yield tuple(map(decode, codes)), decode_label(labels[k])
@@ -283,6 +283,54 @@ def make_input_complete(automaton, missing_transition_go_to='self_loop'):
     return automaton
 
 
+def is_numpy_available():
+    """
+    NumPy is an optional dependency, used only for vectorized computations.
+    """
+    from importlib.util import find_spec
+    return find_spec('numpy') is not None
+
+
+def frequency_count_matrices(frequency_pairs):
+    """
+    Encodes pairs of frequency dictionaries as dense NumPy count matrices over a shared output index.
+    Requires NumPy.
+
+    Args:
+
+        frequency_pairs: list of (first frequency dict, second frequency dict) pairs
+
+    Returns:
+
+        first_counts, second_counts, support; float matrices of shape (number of pairs, number of outputs), where row k
+        holds counts of the k-th pair, and a boolean matrix marking outputs that appear in either dictionary of a pair
+    """
+    import numpy as np
+
+    output_index = dict()
+    rows, first_cols, first_values, second_rows, second_cols, second_values = [], [], [], [], [], []
+    for row, (first, second) in enumerate(frequency_pairs):
+        for o, freq in first.items():
+            rows.append(row)
+            first_cols.append(output_index.setdefault(o, len(output_index)))
+            first_values.append(freq)
+        for o, freq in second.items():
+            second_rows.append(row)
+            second_cols.append(output_index.setdefault(o, len(output_index)))
+            second_values.append(freq)
+
+    shape = (len(frequency_pairs), max(len(output_index), 1))
+    first_counts, second_counts = np.zeros(shape), np.zeros(shape)
+    support = np.zeros(shape, dtype=bool)
+
+    first_counts[rows, first_cols] = first_values
+    second_counts[second_rows, second_cols] = second_values
+    support[rows, first_cols] = True
+    support[second_rows, second_cols] = True
+
+    return first_counts, second_counts, support
+
+
 def convert_i_o_traces_for_RPNI(sequences):
     """
     Converts a list of input-output sequences to RPNI format.
@@ -343,6 +391,12 @@ def generate_input_output_data_from_automata(model, num_sequances=4000, min_seq_
     if isinstance(model, (Sevpa, Vpa)):
         return generate_input_output_data_from_vpa(model, num_sequances, min_seq_len, max_seq_len)
 
+    from aalpy.base import DeterministicAutomaton
+    # deterministic models are executed on their compiled transition tables
+    compiled_model = None
+    if isinstance(model, DeterministicAutomaton) and model.is_input_complete():
+        compiled_model = model.compile()
+
     alphabet = model.get_input_alphabet()
     input_output_sequances = []
     while len(input_output_sequances) < num_sequances:
@@ -350,8 +404,11 @@ def generate_input_output_data_from_automata(model, num_sequances=4000, min_seq_
         for _ in range(random.randint(min_seq_len, max_seq_len)):
             sequance.append(random.choice(alphabet))
 
-        model.reset_to_initial()
-        outputs = model.execute_sequence(model.initial_state, sequance)
+        if compiled_model is not None:
+            outputs = compiled_model.run(sequance)
+        else:
+            model.reset_to_initial()
+            outputs = model.execute_sequence(model.initial_state, sequance)
 
         input_output_sequances.append(list(zip(sequance, outputs)))
 
@@ -11,6 +11,7 @@ from aalpy.SULs import AutomatonSUL
 from aalpy.automata import Mdp, StochasticMealyMachine, MealyMachine, Dfa, MooreMachine, MooreState, MealyState, \
     DfaState
 from aalpy.base import DeterministicAutomaton, SUL, AutomatonState
+from aalpy.utils.HelperFunctions import is_numpy_available
 
 prism_prob_output_regex = re.compile("Result: (\d+\.\d+)")
 
@@ -148,9 +149,239 @@ def evaluate_all_properties(prism_file_name, properties_file_name):
     return results
 
 
+property_token_regex = re.compile(r'\s*(Pmax|Pmin|=\?|<=|<|\d+|"[^"]*"|true|false|[][()!&|FUX])')
+
+
+def _tokenize_property(prop):
+    tokens, index = [], 0
+    prop = prop.strip()
+    while index < len(prop):
+        match = property_token_regex.match(prop, index)
+        if not match:
+            raise ValueError(f'Unsupported property: {prop}')
+        tokens.append(match.group(1))
+        index = match.end()
+    return tokens
+
+
+def _parse_property(prop):
+    """
+    Parses a PRISM property of the form Pmax=? [ path ] or Pmin=? [ path ] into a tuple-encoded syntax tree.
+    Path formulas are until (U) and eventually (F) with optional step bounds (<k, <=k), next (X) and negation,
+    over state formulas built from quoted labels, true, false, !, & and |.
+    """
+    tokens = _tokenize_property(prop)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def expect(token):
+        nonlocal pos
+        if peek() != token:
+            raise ValueError(f'Unsupported property: {prop}')
+        pos += 1
+
+    def parse_bound():
+        nonlocal pos
+        if peek() in {'<', '<='}:
+            op, bound = peek(), tokens[pos + 1] if pos + 1 < len(tokens) else None
+            if bound is None or not bound.isdigit():
+                raise ValueError(f'Unsupported property: {prop}')
+            pos += 2
+            # F<k holds if the target is reached in at most k - 1 steps
+            return int(bound) - 1 if op == '<' else int(bound)
+        return None
+
+    def parse_path():
+        nonlocal pos
+        left = parse_or()
+        if peek() == 'U':
+            pos += 1
+            bound = parse_bound()
+            return 'U', left, bound, parse_or()
+        return left
+
+    def parse_or():
+        nonlocal pos
+        left = parse_and()
+        while peek() == '|':
+            pos += 1
+            left = 'or', left, parse_and()
+        return left
+
+    def parse_and():
+        nonlocal pos
+        left = parse_unary()
+        while peek() == '&':
+            pos += 1
+            left = 'and', left, parse_unary()
+        return left
+
+    def parse_unary():
+        nonlocal pos
+        token = peek()
+        if token == '!':
+            pos += 1
+            return 'not', parse_unary()
+        if token == 'F':
+            pos += 1
+            bound = parse_bound()
+            return 'U', ('bool', True), bound, parse_unary()
+        if token == 'X':
+            pos += 1
+            return 'X', parse_unary()
+        if token == '(':
+            pos += 1
+            path = parse_path()
+            expect(')')
+            return path
+        if token in {'true', 'false'}:
+            pos += 1
+            return 'bool', token == 'true'
+        if token is not None and token.startswith('"'):
+            pos += 1
+            return 'label', token[1:-1]
+        raise ValueError(f'Unsupported property: {prop}')
+
+    optimization = peek()
+    if optimization not in {'Pmax', 'Pmin'}:
+        raise ValueError(f'Unsupported property: {prop}')
+    pos += 1
+    expect('=?')
+    expect('[')
+    formula = parse_path()
+    expect(']')
+    if peek() is not None:
+        raise ValueError(f'Unsupported property: {prop}')
+    return optimization == 'Pmax', formula
+
+
+def _mdp_matrices(mdp: Mdp):
+    """
+    Encodes the MDP as a transition matrix with a row for every state-action pair, sparse if SciPy is available.
+
+    Returns:
+
+        transition matrix, start row of each state with actions, indices of states with actions, state indices
+    """
+    import numpy as np
+
+    state_index = {state: i for i, state in enumerate(mdp.states)}
+    rows, cols, probs = [], [], []
+    row_starts, states_with_actions = [], []
+    num_rows = 0
+    for state in mdp.states:
+        first_row = num_rows
+        for inp, targets in state.transitions.items():
+            if not targets:
+                continue
+            for target, prob in targets:
+                rows.append(num_rows)
+                cols.append(state_index[target])
+                probs.append(prob)
+            num_rows += 1
+        if num_rows > first_row:
+            row_starts.append(first_row)
+            states_with_actions.append(state_index[state])
+
+    shape = (num_rows, len(mdp.states))
+    try:
+        from scipy.sparse import csr_matrix
+        matrix = csr_matrix((probs, (rows, cols)), shape=shape)
+    except ImportError:
+        matrix = np.zeros(shape)
+        np.add.at(matrix, (rows, cols), probs)
+    return matrix, np.array(row_starts, dtype=int), np.array(states_with_actions, dtype=int), state_index
+
+
+def evaluate_all_properties_with_numpy(model: Mdp, properties_file_name, epsilon=1e-10, max_iterations=100000):
+    """
+    Model checks all properties of a PRISM properties file on the MDP in-process with value iteration, without
+    starting PRISM. Supported are Pmax and Pmin of (bounded) reachability and until properties, optionally nested
+    in next (X) or negated. Requires NumPy, SciPy is used for sparse matrices if it is available.
+
+    Args:
+
+        model: Markov Decision Process
+        properties_file_name: path to the PRISM properties file
+        epsilon: unbounded properties are iterated until no value changes by more than epsilon
+        max_iterations: maximum number of iterations for unbounded properties
+
+    Returns:
+
+        results of model checking in the same form as evaluate_all_properties
+    """
+    import numpy as np
+
+    with open(properties_file_name) as properties_file:
+        properties = [line.strip() for line in properties_file
+                      if line.strip() and not line.strip().startswith('//')]
+
+    matrix, row_starts, states_with_actions, state_index = _mdp_matrices(model)
+    num_states = len(model.states)
+    state_labels = [set(state.output.split('__')) for state in model.states]
+
+    def optimal_step(values, maximize):
+        # states without actions cannot reach other states
+        step_values = np.zeros(num_states)
+        if len(row_starts):
+            reduce = np.maximum if maximize else np.minimum
+            step_values[states_with_actions] = reduce.reduceat(matrix @ values, row_starts)
+        return step_values
+
+    def is_path_formula(formula):
+        return formula[0] in {'U', 'X'} or formula[0] == 'not' and is_path_formula(formula[1])
+
+    def state_formula(formula):
+        operator = formula[0]
+        if operator == 'label':
+            return np.array([formula[1] in labels for labels in state_labels], dtype=bool)
+        if operator == 'bool':
+            return np.full(num_states, formula[1], dtype=bool)
+        if operator == 'not':
+            return ~state_formula(formula[1])
+        if operator == 'and':
+            return state_formula(formula[1]) & state_formula(formula[2])
+        if operator == 'or':
+            return state_formula(formula[1]) | state_formula(formula[2])
+        raise ValueError('Path formulas can not be combined with & and |.')
+
+    def path_formula(formula, maximize):
+        operator = formula[0]
+        if operator == 'not':
+            return 1 - path_formula(formula[1], not maximize)
+        if operator == 'X':
+            if is_path_formula(formula[1]):
+                return optimal_step(path_formula(formula[1], maximize), maximize)
+            return optimal_step(state_formula(formula[1]).astype(float), maximize)
+        if operator == 'U':
+            _, left, bound, right = formula
+            safe, goal = state_formula(left), state_formula(right)
+            values = goal.astype(float)
+            for i in range(bound if bound is not None else max_iterations):
+                new_values = np.where(goal, 1., np.where(safe, optimal_step(values, maximize), 0.))
+                converged = np.max(np.abs(new_values - values), initial=0) <= epsilon
+                values = new_values
+                if bound is None and converged:
+                    break
+            return values
+        raise ValueError(f'Unsupported path formula: {formula}')
+
+    initial_index = state_index[model.initial_state]
+    results = {}
+    for prop in properties:
+        maximize, formula = _parse_property(prop)
+        results[f'prop{len(results) + 1}'] = float(path_formula(formula, maximize)[initial_index])
+    return results
+
+
 def model_check_properties(model: Mdp, properties: str):
     """
 
+    Model checks the properties with PRISM. If aalpy.paths.path_to_prism is not set, properties are checked
+    in-process with evaluate_all_properties_with_numpy instead.
+
     Args:
         model: Markov Decision Process that serves as a basis for model checking.
         properties: Properties file. It should point to a file under the path_to_properties folder.
@@ -159,6 +390,12 @@ def model_check_properties(model: Mdp, properties: str):
 
         results of model checking
     """
+    if aalpy.paths.path_to_prism is None:
+        if not is_numpy_available():
+            print('Set aalpy.paths.path_to_prism or install NumPy to model check properties.')
+            return dict()
+        return evaluate_all_properties_with_numpy(model, properties)
+
     from os import remove
     from aalpy.utils import mdp_2_prism_format
     mdp_2_prism_format(mdp=model, name='mc_exp', output_path=f'mc_exp.prism')
@@ -324,8 +561,12 @@ def compare_automata(aut_1: DeterministicAutomaton, aut_2: DeterministicAutomato
         if not state.prefix:
             state.prefix = test_automaton.get_shortest_path(test_automaton.initial_state, state)
 
+    walks_per_state, walk_len = min(100, len(input_al) * 10), 10
+    if is_numpy_available() and base_automaton.is_input_complete() and test_automaton.is_input_complete():
+        return _compare_compiled_automata(base_automaton, test_automaton, num_cex, walks_per_state, walk_len)
+
     # setup  the eq oracle
-    eq_oracle = RandomWMethodEqOracle(input_al, base_sul, walks_per_state=min(100, len(input_al) * 10), walk_len=10)
+    eq_oracle = RandomWMethodEqOracle(input_al, base_sul, walks_per_state=walks_per_state, walk_len=walk_len)
 
     found_cex = []
     # to avoid near "infinite" loops due to while loop and set requirement
@@ -347,6 +588,103 @@ def compare_automata(aut_1: DeterministicAutomaton, aut_2: DeterministicAutomato
     return found_cex
 
 
+def _compare_compiled_automata(base_automaton, test_automaton, num_cex, walks_per_state, walk_len):
+    """
+    Executes test cases of the randomized W-method (see RandomWMethodEqOracle) on both automata at once and returns
+    up to num_cex counterexamples, sorted by length.
+    """
+    import numpy as np
+    from random import shuffle, choice, randint
+
+    if not test_automaton.characterization_set:
+        test_automaton.characterization_set = test_automaton.compute_characterization_set()
+        if not test_automaton.characterization_set:
+            test_automaton.characterization_set = [(a,) for a in test_automaton.get_input_alphabet()]
+
+    input_al = test_automaton.get_input_alphabet()
+    states_to_cover = [state for state in test_automaton.states for _ in range(walks_per_state)]
+    shuffle(states_to_cover)
+    test_cases = [state.prefix + tuple(choice(input_al) for _ in range(randint(1, walk_len))) +
+                  choice(test_automaton.characterization_set) for state in states_to_cover]
+
+    compiled_base, compiled_test = base_automaton.compile(), test_automaton.compile()
+    base_outputs = compiled_base.execute_batch(compiled_base.encode_inputs(test_cases))
+    test_outputs = compiled_test.execute_batch(compiled_test.encode_inputs(test_cases))
+
+    # outputs of the test automaton are translated to output indices of the base automaton, -2 if not its output
+    output_translation = np.array([compiled_base.output_index.get(output, -2)
+                                   for output in compiled_test.output_alphabet] + [-1], dtype=np.int64)
+    differences = base_outputs != output_translation[test_outputs]
+
+    found_cex = []
+    for row in np.flatnonzero(differences.any(axis=1)):
+        cex = test_cases[row][:int(differences[row].argmax()) + 1]
+        if cex not in found_cex:
+            found_cex.append(cex)
+            if len(found_cex) == num_cex:
+                break
+
+    found_cex.sort(key=len)
+    return found_cex
+
+
+def trace_conformance(model: DeterministicAutomaton, traces, batch_size=100000):
+    """
+    Computes the ratio of traces, given as lists of (input, output) pairs, that are reproduced by a deterministic
+    model, e.g., when evaluating a learned model on log data. With NumPy, traces are executed in batches, all traces
+    of a batch in lock-step (see CompiledAutomaton.execute_batch). Inputs of all traces have to be in the input
+    alphabet of the model, which has to be input complete.
+
+    Args:
+
+        model: deterministic model
+        traces: list of traces, each trace is a list of (input, output) pairs
+        batch_size: number of traces executed at once
+
+    Returns:
+
+        number of traces whose outputs are equal to the outputs of the model / number of traces
+    """
+    if not traces:
+        return 1.
+
+    compiled_model = model.compile()
+    if not is_numpy_available():
+        conforming = sum(compiled_model.run([i for i, _ in trace]) == [o for _, o in trace] for trace in traces)
+        return conforming / len(traces)
+
+    import numpy as np
+    from itertools import chain, repeat
+
+    # (input, output) pairs are encoded as input index * number of outputs + output index, and pairs with outputs
+    # that are not produced by the model as -1
+    num_outputs = len(compiled_model.output_alphabet)
+    pair_index = {(i, o): input_index * num_outputs + output_index
+                  for i, input_index in compiled_model.input_index.items()
+                  for o, output_index in compiled_model.output_index.items()}
+
+    conforming = 0
+    for batch_start in range(0, len(traces), batch_size):
+        batch = traces[batch_start:batch_start + batch_size]
+        lengths = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+        encoded_pairs = np.fromiter(map(pair_index.get, chain.from_iterable(batch), repeat(-1)), dtype=np.int64,
+                                    count=int(lengths.sum()))
+        if (encoded_pairs < 0).any() and not all(i in compiled_model.input_index for trace in batch for i, _ in trace):
+            raise KeyError('Inputs of traces have to be in the input alphabet of the model.')
+
+        # unknown pairs are executed with the first input and never match the expected output
+        mask = np.arange(int(lengths.max(initial=0))) < lengths[:, None]
+        encoded_inputs = np.full(mask.shape, -1, dtype=np.int64)
+        encoded_inputs[mask] = np.where(encoded_pairs < 0, 0, encoded_pairs // num_outputs)
+        expected_outputs = np.full(mask.shape, -1, dtype=np.int64)
+        expected_outputs[mask] = np.where(encoded_pairs < 0, -2, encoded_pairs % num_outputs)
+
+        encoded_outputs = compiled_model.execute_batch(encoded_inputs)
+        conforming += int((encoded_outputs == expected_outputs).all(axis=1).sum())
+
+    return conforming / len(traces)
+
+
 class TestCaseWrapperSUL(SUL):
     def __init__(self, sul):
         super().__init__()
@@ -421,6 +759,21 @@ def statistical_model_checking(model, goals, max_num_steps, num_tests=105967):
 
     goal_reached = 0
     inputs = model.get_input_alphabet()
+
+    # tests on deterministic models are executed in batches, all tests of a batch in lock-step
+    if isinstance(model, DeterministicAutomaton) and is_numpy_available() and model.is_input_complete():
+        import numpy as np
+
+        compiled_model = model.compile()
+        goal_indices = [compiled_model.output_index[goal] for goal in goals if goal in compiled_model.output_index]
+        batch_size = 10000
+        for batch_start in range(0, num_tests, batch_size):
+            test_sequences = [choices(inputs, k=max_num_steps) for _ in range(min(batch_size, num_tests - batch_start))]
+            encoded_outputs = compiled_model.execute_batch(compiled_model.encode_inputs(test_sequences))
+            goal_reached += int(np.isin(encoded_outputs, goal_indices).any(axis=1).sum())
+
+        return goal_reached / num_tests
+
     for _ in range(num_tests):
         test_sequence = choices(inputs, k=max_num_steps)
         outputs = compute_output_sequence(model, test_sequence)
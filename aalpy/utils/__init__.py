@@ -17,6 +17,7 @@ from .DataHandler import (
     CharacterTokenizer,
     DelimiterTokenizer,
     IODelimiterTokenizer,
+    EncodedTraces,
 )
 from .FileHandler import (
     save_automaton_to_file,
@@ -32,6 +33,7 @@ from .ModelChecking import (
     compare_automata,
     generate_test_cases,
     statistical_model_checking,
+    trace_conformance,
     bisimilar,
 )
 from .HelperFunctions import (
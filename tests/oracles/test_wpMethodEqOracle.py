@@ -0,0 +1,70 @@
+import unittest
+
+from aalpy.SULs import AutomatonSUL
+from aalpy.automata import MealyMachine
+from aalpy.learning_algs import run_Lstar
+from aalpy.oracles import WMethodEqOracle, WpMethodEqOracle, HsiMethodEqOracle, RandomWpMethodEqOracle
+from aalpy.utils import generate_random_dfa
+
+
+class WpMethodEqOracleTests(unittest.TestCase):
+
+    @staticmethod
+    def learn_and_validate(oracle_constructor):
+        alphabet = [*range(0, 3)]
+        dfa = generate_random_dfa(6, alphabet, 3)
+
+        learning_sul = AutomatonSUL(dfa)
+        eq_oracle = oracle_constructor(alphabet, learning_sul)
+        learned_model = run_Lstar(alphabet, learning_sul, eq_oracle, 'dfa', print_level=0)
+
+        validation_eq_oracle = WMethodEqOracle(alphabet, AutomatonSUL(dfa),
+                                               max_number_of_states=len(learned_model.states) + 2)
+        return validation_eq_oracle.find_cex(learned_model)
+
+    def test_wp_method(self):
+        cex = self.learn_and_validate(lambda alphabet, sul: WpMethodEqOracle(alphabet, sul, max_number_of_states=7))
+        self.assertIsNone(cex, "Counterexample found by WMethodEqOracle")
+
+    def test_hsi_method(self):
+        cex = self.learn_and_validate(lambda alphabet, sul: HsiMethodEqOracle(alphabet, sul, max_number_of_states=7))
+        self.assertIsNone(cex, "Counterexample found by WMethodEqOracle")
+
+    def test_random_wp_method(self):
+        cex = self.learn_and_validate(lambda alphabet, sul: RandomWpMethodEqOracle(alphabet, sul, walks_per_state=50))
+        self.assertIsNone(cex, "Counterexample found by WMethodEqOracle")
+
+    def test_smaller_test_set(self):
+        alphabet = [*range(0, 4)]
+        dfa = generate_random_dfa(30, alphabet, 10)
+        dfa.characterization_set = dfa.compute_characterization_set()
+        for state in dfa.states:
+            state.prefix = dfa.get_shortest_path(dfa.initial_state, state)
+
+        num_queries = []
+        for oracle_class in [WMethodEqOracle, WpMethodEqOracle, HsiMethodEqOracle]:
+            eq_oracle = oracle_class(alphabet, AutomatonSUL(dfa.copy()), max_number_of_states=len(dfa.states) + 1)
+            self.assertIsNone(eq_oracle.find_cex(dfa))
+            num_queries.append(eq_oracle.num_queries)
+
+        self.assertLess(num_queries[1], num_queries[0])
+        self.assertLess(num_queries[2], num_queries[0])
+
+    def test_input_incomplete_hypothesis(self):
+        mealy = MealyMachine.from_state_setup({'a': {'x': ('0', 'b'), 'y': ('0', 'a')},
+                                               'b': {'x': ('1', 'c'), 'y': ('1', 'b')},
+                                               'c': {'x': ('2', 'a'), 'y': ('0', 'c')}})
+        # transition of b on y is undefined in the hypothesis
+        hypothesis = MealyMachine.from_state_setup({'a': {'x': ('0', 'b'), 'y': ('0', 'a')},
+                                                    'b': {'x': ('1', 'c')},
+                                                    'c': {'x': ('2', 'a'), 'y': ('0', 'c')}})
+
+        for eq_oracle in [WpMethodEqOracle(['x', 'y'], AutomatonSUL(mealy), max_number_of_states=5),
+                          HsiMethodEqOracle(['x', 'y'], AutomatonSUL(mealy), max_number_of_states=5),
+                          RandomWpMethodEqOracle(['x', 'y'], AutomatonSUL(mealy))]:
+            self.assertIsNone(eq_oracle.find_cex(hypothesis))
+            self.assertGreater(eq_oracle.num_queries, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,12 +2,13 @@ import unittest
 
 from aalpy.SULs import AutomatonSUL
 from aalpy.automata import Dfa, MealyMachine, MooreMachine
+from aalpy.base.SUL import CacheSUL
 from aalpy.learning_algs import run_Lstar
 from aalpy.oracles import WMethodEqOracle, RandomWalkEqOracle, StatePrefixEqOracle, TransitionFocusOracle, \
     RandomWMethodEqOracle, BreadthFirstExplorationEqOracle, RandomWordEqOracle, CacheBasedEqOracle, \
-    KWayStateCoverageEqOracle
+    KWayStateCoverageEqOracle, PacOracle, KWayTransitionCoverageEqOracle, PortfolioEqOracle
 from aalpy.utils import get_Angluin_dfa, load_automaton_from_file
-from aalpy.utils.ModelChecking import bisimilar
+from aalpy.utils.ModelChecking import bisimilar, trace_conformance
 
 correct_automata = {Dfa: get_Angluin_dfa(),
                     MealyMachine: load_automaton_from_file('../DotModels/Angluin_Mealy.dot', automaton_type='mealy'),
@@ -137,6 +138,98 @@ class DeterministicTest(unittest.TestCase):
 
         assert True
 
+    def test_parallel_eq_oracles(self):
+        angluin_example = get_Angluin_dfa()
+
+        alphabet = angluin_example.get_input_alphabet()
+
+        for automata in ['dfa', 'mealy', 'moore']:
+            sul = AutomatonSUL(angluin_example)
+
+            oracles = [RandomWordEqOracle(alphabet, sul, num_processes=2),
+                       StatePrefixEqOracle(alphabet, sul, walks_per_state=10, walk_len=50, num_processes=2),
+                       RandomWMethodEqOracle(alphabet, sul, walks_per_state=10, walk_len=50, num_processes=2),
+                       PacOracle(alphabet, sul, num_processes=2),
+                       WMethodEqOracle(alphabet, sul, max_number_of_states=len(angluin_example.states) + 1,
+                                       num_processes=2)]
+
+            for oracle in oracles:
+                sul = AutomatonSUL(angluin_example)
+                oracle.sul = sul
+
+                learned_model = run_Lstar(alphabet, sul, oracle, automaton_type=automata,
+                                          cache_and_non_det_check=True, print_level=0)
+
+                self.assertTrue(self.prove_equivalence(learned_model))
+                self.assertGreater(oracle.num_steps, 0)
+
+        # returned counterexamples are the shortest ones found by the processes
+        hypothesis = Dfa.from_state_setup({'q0': (True, {'a': 'q0', 'b': 'q0'})})
+        oracle = WMethodEqOracle(alphabet, AutomatonSUL(angluin_example), max_number_of_states=4, num_processes=2)
+        cex = oracle.find_cex(hypothesis)
+        self.assertIsNotNone(cex)
+        self.assertNotEqual(angluin_example.compute_output_seq(angluin_example.initial_state, cex)[-1],
+                            hypothesis.compute_output_seq(hypothesis.initial_state, cex)[-1])
+
+        # queries executed in parallel are not cached
+        oracle = WMethodEqOracle(alphabet, CacheSUL(AutomatonSUL(angluin_example)), max_number_of_states=4,
+                                 num_processes=2)
+        with self.assertWarns(UserWarning):
+            self.assertIsNotNone(oracle.find_cex(hypothesis))
+
+        # walks cancelled once a counterexample is found are not counted as done
+        oracle = RandomWordEqOracle(alphabet, AutomatonSUL(angluin_example), num_walks=1000, reset_after_cex=False,
+                                    num_processes=2)
+        self.assertIsNotNone(oracle.find_cex(hypothesis))
+        self.assertLess(oracle.num_walks_done, oracle.num_walks)
+        self.assertEqual(oracle.num_walks_done + len(oracle.walk_lengths), oracle.num_walks)
+        self.assertEqual(oracle.num_steps, oracle.num_queries)
+
+    def test_portfolio_eq_oracle(self):
+        angluin_example = get_Angluin_dfa()
+
+        alphabet = angluin_example.get_input_alphabet()
+
+        for automata in ['dfa', 'mealy', 'moore']:
+            sul = AutomatonSUL(angluin_example)
+
+            oracles = [RandomWMethodEqOracle(alphabet, sul, walks_per_state=10, walk_len=50),
+                       KWayTransitionCoverageEqOracle(alphabet, sul),
+                       CacheBasedEqOracle(alphabet, sul)]
+            portfolio_oracle = PortfolioEqOracle(alphabet, sul, oracles, num_processes=4)
+
+            learned_model = run_Lstar(alphabet, sul, portfolio_oracle, automaton_type=automata,
+                                      cache_and_non_det_check=True, print_level=0)
+
+            self.assertTrue(self.prove_equivalence(learned_model))
+            self.assertEqual(sum(portfolio_oracle.num_cex), sum(len(times) for times in portfolio_oracle.cex_times))
+            self.assertEqual(sum(portfolio_oracle.allocate_processes()), 4)
+            # oracles keep their own SULs
+            self.assertTrue(all(oracle.sul is sul and oracle.num_processes == 1 for oracle in oracles))
+
+        # without fork, oracles search one after another
+        from unittest.mock import patch
+
+        sul = AutomatonSUL(angluin_example)
+        oracles = [RandomWMethodEqOracle(alphabet, sul, walks_per_state=10, walk_len=50),
+                   KWayTransitionCoverageEqOracle(alphabet, sul)]
+        portfolio_oracle = PortfolioEqOracle(alphabet, sul, oracles, num_processes=2)
+        with patch('multiprocessing.get_start_method', return_value='spawn'):
+            learned_model = run_Lstar(alphabet, sul, portfolio_oracle, automaton_type='dfa', print_level=0)
+
+        self.assertTrue(self.prove_equivalence(learned_model))
+        self.assertGreater(sum(portfolio_oracle.num_cex), 0)
+        self.assertTrue(all(oracle.num_processes == 1 for oracle in oracles))
+
+        # oracles that find counterexamples faster are given more processes
+        portfolio_oracle = PortfolioEqOracle(alphabet, sul, oracles, num_processes=12)
+        portfolio_oracle.num_cex = [1, 1, 0]
+        portfolio_oracle.cex_times = [[0.1], [10], []]
+        allocation = portfolio_oracle.allocate_processes()
+        self.assertEqual(sum(allocation), 12)
+        self.assertGreater(allocation[0], allocation[1])
+        self.assertGreater(allocation[0], allocation[2])
+
     def test_all_configuration_combinations(self):
         angluin_example = get_Angluin_dfa()
 
@@ -191,3 +284,31 @@ class DeterministicTest(unittest.TestCase):
                                     assert False
 
         assert True
+
+    def test_compiled_automata(self):
+        from random import choices
+
+        for automaton in correct_automata.values():
+            compiled = automaton.compile()
+            alphabet = automaton.get_input_alphabet()
+
+            sequences = [tuple(choices(alphabet, k=length)) for length in range(1, 20)]
+            outputs = [automaton.execute_sequence(automaton.initial_state, seq) for seq in sequences]
+
+            self.assertEqual([compiled.run(seq) for seq in sequences], outputs)
+            self.assertEqual(compiled.run_many(sequences), outputs)
+
+            encoded_outputs = automaton.execute_batch(compiled.encode_inputs(sequences)).tolist()
+            self.assertEqual([[compiled.output_alphabet[o] for o in row[:len(seq)]]
+                              for row, seq in zip(encoded_outputs, sequences)], outputs)
+            self.assertTrue(all(o == -1 for row, seq in zip(encoded_outputs, sequences) for o in row[len(seq):]))
+
+            traces = [list(zip(seq, out)) for seq, out in zip(sequences, outputs)]
+            self.assertEqual(trace_conformance(automaton, traces), 1.)
+            traces[0][-1] = (traces[0][-1][0], 'not an output')
+            self.assertAlmostEqual(trace_conformance(automaton, traces, batch_size=5), 1 - 1 / len(traces))
+
+            for state in automaton.states:
+                state_index = compiled.state_index[state]
+                self.assertEqual(compiled.run(sequences[-1], state_index),
+                                 automaton.compute_output_seq(state, sequences[-1]))
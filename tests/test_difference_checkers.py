@@ -0,0 +1,25 @@
+import random
+import unittest
+
+from aalpy.learning_algs.stochastic.DifferenceChecker import HoeffdingChecker, AdvancedHoeffdingChecker, \
+    ChiSquareChecker
+
+
+class DifferenceCheckerTest(unittest.TestCase):
+
+    def test_batch_checks_match_single_checks(self):
+        random.seed(1)
+        outputs = ['a', 'b', 'c', 'd', 'e']
+
+        cell_pairs = []
+        for _ in range(2000):
+            c1 = {o: random.randint(1, 40) for o in random.sample(outputs, random.randint(0, len(outputs)))}
+            if random.random() < 0.3:
+                c2 = {o: random.randint(1, 40) for o in c1}
+            else:
+                c2 = {o: random.randint(1, 40) for o in random.sample(outputs, random.randint(1, len(outputs)))}
+            cell_pairs.append((c1, c2))
+
+        for checker in [HoeffdingChecker(), AdvancedHoeffdingChecker(), ChiSquareChecker()]:
+            single_results = [checker.are_cells_different(c1, c2) for c1, c2 in cell_pairs]
+            self.assertEqual(checker.are_cells_different_batch(cell_pairs), single_results)
@@ -28,3 +28,104 @@ class NonDeterministicTest(unittest.TestCase):
             if cex or len(learned_onfsm.states) != len(onfsm.states):
                 assert False
         assert True
+
+    def test_non_det_adaptive_sampling(self):
+
+        from aalpy.SULs import AutomatonSUL
+        from aalpy.oracles import RandomWordEqOracle, RandomWalkEqOracle
+        from aalpy.learning_algs import run_non_det_Lstar
+        from aalpy.utils import get_benchmark_ONFSM
+
+        onfsm = get_benchmark_ONFSM()
+        alphabet = onfsm.get_input_alphabet()
+
+        for _ in range(20):
+            sul = AutomatonSUL(onfsm)
+
+            oracle = RandomWordEqOracle(alphabet, sul, num_walks=500, min_walk_len=2, max_walk_len=5)
+
+            learned_onfsm = run_non_det_Lstar(alphabet, sul, oracle, n_sampling=100, sampling_confidence=0.98,
+                                              print_level=0)
+
+            eq_oracle = RandomWalkEqOracle(alphabet, sul, num_steps=10000, reset_prob=0.09,
+                                           reset_after_cex=True)
+
+            cex = eq_oracle.find_cex(learned_onfsm)
+
+            if cex or len(learned_onfsm.states) != len(onfsm.states):
+                assert False
+        assert True
+
+    def test_abstracted_table_caches(self):
+
+        from random import seed
+        from unittest.mock import patch
+
+        from aalpy.SULs import AutomatonSUL
+        from aalpy.oracles import RandomWordEqOracle
+        from aalpy.learning_algs import run_abstracted_ONFSM_Lstar
+        from aalpy.learning_algs.non_deterministic.AbstractedOnfsmObservationTable import \
+            AbstractedNonDetObservationTable
+        from aalpy.utils import get_ONFSM
+
+        onfsm = get_ONFSM()
+        alphabet = onfsm.get_input_alphabet()
+        abstraction_mapping = {0: 0, 'O': 0}
+
+        def learn(random_seed):
+            seed(random_seed)
+            sul = AutomatonSUL(onfsm)
+            eq_oracle = RandomWordEqOracle(alphabet, sul, num_walks=500, min_walk_len=4, max_walk_len=8)
+            return run_abstracted_ONFSM_Lstar(alphabet, sul, eq_oracle, abstraction_mapping=abstraction_mapping,
+                                              n_sampling=50, print_level=0)
+
+        abstract_obs_table = AbstractedNonDetObservationTable.abstract_obs_table
+        row_to_hashable = AbstractedNonDetObservationTable.row_to_hashable
+
+        # every cell is abstracted again and every row is hashed again, as before the caches were introduced
+        def uncached_abstract_obs_table(table):
+            table.abstraction_cache.clear()
+            table.abstracted_cells.clear()
+            abstract_obs_table(table)
+
+        def uncached_row_to_hashable(table, row_prefix):
+            table.row_cache.clear()
+            return row_to_hashable(table, row_prefix)
+
+        for random_seed in range(5):
+            cached_model = learn(random_seed)
+
+            with patch.object(AbstractedNonDetObservationTable, 'abstract_obs_table', uncached_abstract_obs_table), \
+                    patch.object(AbstractedNonDetObservationTable, 'row_to_hashable', uncached_row_to_hashable):
+                uncached_model = learn(random_seed)
+
+            self.assertEqual(str(cached_model), str(uncached_model))
+
+    def test_abstracted_table_clean_obs_table(self):
+
+        from aalpy.SULs import AutomatonSUL
+        from aalpy.learning_algs.non_deterministic.AbstractedOnfsmObservationTable import \
+            AbstractedNonDetObservationTable
+        from aalpy.learning_algs.non_deterministic.NonDeterministicSULWrapper import NonDeterministicSULWrapper
+        from aalpy.utils import get_ONFSM
+
+        onfsm = get_ONFSM()
+        alphabet = onfsm.get_input_alphabet()
+        table = AbstractedNonDetObservationTable(alphabet, NonDeterministicSULWrapper(AutomatonSUL(onfsm)),
+                                                 {0: 0, 'O': 0})
+
+        # row_a duplicates the initial row, row_aa is an extension of row_a
+        initial_row, row_a, row_aa = ((), ()), (('a',), (0,)), (('a', 'a'), (0, 0))
+        e = (('a',),)
+        table.observation_table.S = [initial_row, row_a, row_aa]
+        # after abstraction, S of both tables is the same list
+        table.S = table.observation_table.S
+        table.E = [e]
+        table.T[initial_row][e] = {(0,)}
+        table.T[row_a][e] = {(0,)}
+        table.T[row_aa][e] = {('O',)}
+
+        table.clean_obs_table()
+
+        self.assertEqual(table.S, [initial_row])
+        self.assertIs(table.S, table.observation_table.S)
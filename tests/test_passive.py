@@ -0,0 +1,215 @@
+import os
+import random
+import tempfile
+import unittest
+
+from aalpy.learning_algs import run_RPNI, run_Alergia
+from aalpy.learning_algs.deterministic_passive.GeneralizedStateMerging import GeneralizedStateMerging
+from aalpy.learning_algs.stochastic_passive.Alergia import Alergia, _load_jAlergia_model
+from aalpy.SULs import AutomatonSUL
+from aalpy.utils import generate_random_deterministic_automata, generate_random_mdp, generate_input_output_data_from_automata, \
+    convert_i_o_traces_for_RPNI, generate_random_markov_chain, load_automaton_from_file, save_automaton_to_file
+from aalpy.utils.BenchmarkSULs import get_faulty_coffee_machine_SMM
+from aalpy.utils import EncodedTraces
+from aalpy.utils.HelperFunctions import all_prefixes, is_numpy_available
+
+
+class UncachedEdsm(GeneralizedStateMerging):
+    def _get_score(self, red, blue):
+        partitions, score, _ = self._compute_merge(red, blue)
+        return score if partitions is not None else None
+
+
+def get_rpni_data(automaton_type, num_states=6):
+    model = generate_random_deterministic_automata(automaton_type=automaton_type, num_states=num_states,
+                                                   input_alphabet_size=3, output_alphabet_size=3)
+    input_al = model.get_input_alphabet()
+
+    if automaton_type == 'mealy':
+        data = []
+        for _ in range(200):
+            random_seq = random.choices(input_al, k=random.randint(1, 8))
+            for prefix in all_prefixes(random_seq):
+                data.append((prefix, model.compute_output_seq(model.initial_state, prefix)[-1]))
+        return data
+
+    data = generate_input_output_data_from_automata(model, num_sequances=300, min_seq_len=1, max_seq_len=8)
+    return convert_i_o_traces_for_RPNI(data)
+
+
+def get_mdp_data(mdp, num_sequences):
+    sul = AutomatonSUL(mdp)
+    inputs = mdp.get_input_alphabet()
+
+    data = []
+    for _ in range(num_sequences):
+        sul.pre()
+        seq = [mdp.initial_state.output]
+        for _ in range(random.randint(3, 10)):
+            i = random.choice(inputs)
+            seq.append((i, sul.step(i)))
+        sul.post()
+        data.append(seq)
+    return data
+
+
+class PassiveLearningTest(unittest.TestCase):
+
+    def assert_consistent(self, model, data):
+        for input_seq, label in data:
+            output = model.compute_output_seq(model.initial_state, input_seq)[-1]
+            self.assertEqual(output, label)
+
+    def test_rpni_algorithms_consistent_with_data(self):
+        random.seed(1)
+
+        for automaton_type in ['dfa', 'moore', 'mealy']:
+            data = get_rpni_data(automaton_type)
+
+            # classic RPNI does not generalize prefix-closed Mealy data
+            algorithms = ['gsm', 'edsm'] if automaton_type == 'mealy' else ['gsm', 'edsm', 'classic']
+            for algorithm in algorithms:
+                learned_model = run_RPNI(list(data), automaton_type, algorithm=algorithm, print_info=False)
+                self.assert_consistent(learned_model, data)
+
+    def test_edsm_cached_scores_match_recomputed_scores(self):
+        random.seed(2)
+
+        for automaton_type in ['dfa', 'moore', 'mealy']:
+            data = get_rpni_data(automaton_type, num_states=10)
+
+            cached = GeneralizedStateMerging(list(data), automaton_type, print_info=False, merging_strategy='edsm')
+            uncached = UncachedEdsm(list(data), automaton_type, print_info=False, merging_strategy='edsm')
+            cached.run_rpni()
+            uncached.run_rpni()
+
+            self.assertEqual(cached.log, uncached.log)
+
+    def test_edsm_candidate_window(self):
+        random.seed(3)
+
+        data = get_rpni_data('moore', num_states=10)
+
+        unbounded = GeneralizedStateMerging(list(data), 'moore', print_info=False, merging_strategy='edsm')
+        unbounded.run_rpni()
+        # window larger than any blue fringe behaves as if it was unbounded
+        large_window = GeneralizedStateMerging(list(data), 'moore', print_info=False, merging_strategy='edsm',
+                                               candidate_window=len(data))
+        large_window.run_rpni()
+        self.assertEqual(unbounded.log, large_window.log)
+
+        for window in [1, 2]:
+            learned_model = run_RPNI(list(data), 'moore', algorithm='edsm', candidate_window=window,
+                                     print_info=False)
+            self.assert_consistent(learned_model, data)
+
+    def test_edsm_selects_merge_with_more_evidence(self):
+        # sample of words with an even number of a's
+        data = [(('b', 'b', 'b'), True), ((), True), (('a', 'b'), False)]
+
+        gsm_model = run_RPNI(list(data), 'dfa', algorithm='gsm', print_info=False)
+        edsm_model = run_RPNI(list(data), 'dfa', algorithm='edsm', print_info=False)
+
+        self.assert_consistent(edsm_model, data)
+        self.assertEqual(len(gsm_model.states), 3)
+        self.assertEqual(len(edsm_model.states), 2)
+
+    def test_alergia_deep_fpta(self):
+        random.seed(4)
+
+        # traces longer than the default recursion limit
+        data = [['init'] + [(random.choice('ab'), random.choice('xy')) for _ in range(2000)] for _ in range(20)]
+
+        model = run_Alergia(data, automaton_type='mdp')
+        self.assertIsNotNone(model)
+
+    def test_incremental_alergia(self):
+        random.seed(5)
+
+        mdp = generate_random_mdp(5, 2, 3)
+        batches = [get_mdp_data(mdp, 1000) for _ in range(4)]
+
+        alergia = Alergia(list(batches[0]), automaton_type='mdp')
+        all_data = list(batches[0])
+        for batch in batches[1:]:
+            alergia.run()
+            alergia.insert_data(batch)
+            all_data.extend(batch)
+
+            incremental_model = alergia.run()
+            model = Alergia(list(all_data), automaton_type='mdp').run()
+
+            self.assertEqual(str(incremental_model), str(model))
+
+    def test_parallel_fpta_construction(self):
+        random.seed(7)
+
+        data = get_mdp_data(generate_random_mdp(5, 2, 3), 2000)
+
+        model = run_Alergia(list(data), automaton_type='mdp')
+        parallel_model = run_Alergia(list(data), automaton_type='mdp', num_processes=3)
+        self.assertEqual(str(model), str(parallel_model))
+
+    def test_alergia_sampling_below_depth(self):
+        random.seed(9)
+
+        mdp = generate_random_mdp(4, 2, 3)
+        data = get_mdp_data(mdp, 10000)
+
+        exact = Alergia(list(data), automaton_type='mdp')
+        sampled = Alergia(list(data), automaton_type='mdp', sampling_depth=3, sampling_rate=0.2)
+
+        # nodes up to the sampling depth have exact frequencies
+        exact_node, sampled_node = exact.fpta, sampled.fpta
+        for el in data[0][1:4]:
+            self.assertEqual(exact_node.original_input_frequency, sampled_node.original_input_frequency)
+            self.assertEqual(sampled_node.sample_weight, 1)
+            exact_node, sampled_node = exact_node.original_children[el], sampled_node.original_children[el]
+        self.assertEqual(sampled_node.sample_weight, 5)
+
+        self.assertEqual(exact.run().size, sampled.run().size)
+
+    @unittest.skipUnless(is_numpy_available(), 'EncodedTraces require NumPy')
+    def test_encoded_traces(self):
+        import numpy as np
+        random.seed(8)
+
+        mdp_data = get_mdp_data(generate_random_mdp(5, 2, 3), 2000)
+        # ragged form, traces are [O, I, O, I, O, ...]
+        vocabulary = sorted({s for seq in mdp_data for s in [seq[0]] + [x for io in seq[1:] for x in io]})
+        codes = {s: k for k, s in enumerate(vocabulary)}
+        traces = [[codes[seq[0]]] + [codes[x] for io in seq[1:] for x in io] for seq in mdp_data]
+        encoded_mdp_data = EncodedTraces(np.array([c for trace in traces for c in trace]),
+                                         offsets=np.cumsum([0] + [len(trace) for trace in traces]),
+                                         vocabulary=vocabulary)
+
+        self.assertEqual(str(run_Alergia(list(mdp_data), automaton_type='mdp', eps='auto')),
+                         str(run_Alergia(encoded_mdp_data, automaton_type='mdp', eps='auto')))
+
+        rpni_data = get_rpni_data('dfa')
+        # padded form, labels are used as codes of labels
+        vocabulary = sorted({i for seq, _ in rpni_data for i in seq})
+        codes = {i: k for k, i in enumerate(vocabulary)}
+        lengths = [len(seq) for seq, _ in rpni_data]
+        padded = np.zeros((len(rpni_data), max(lengths)), dtype=int)
+        for k, (seq, _) in enumerate(rpni_data):
+            padded[k, :len(seq)] = [codes[i] for i in seq]
+        encoded_rpni_data = EncodedTraces(padded, lengths=lengths, vocabulary=vocabulary,
+                                          labels=[label for _, label in rpni_data])
+
+        self.assertEqual(str(run_RPNI(list(rpni_data), 'dfa', print_info=False)),
+                         str(run_RPNI(encoded_rpni_data, 'dfa', print_info=False)))
+
+    def test_jalergia_model_loading(self):
+        random.seed(6)
+
+        models = [('mdp', generate_random_mdp(5, 2, 3)), ('smm', get_faulty_coffee_machine_SMM()),
+                  ('mc', generate_random_markov_chain(5))]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'model')
+            for automaton_type, model in models:
+                save_automaton_to_file(model, path)
+
+                loaded_model = _load_jAlergia_model(path + '.dot', automaton_type)
+                self.assertEqual(str(loaded_model), str(load_automaton_from_file(path + '.dot', automaton_type)))
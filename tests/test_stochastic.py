@@ -4,7 +4,9 @@ import aalpy.paths
 from aalpy.SULs import AutomatonSUL
 from aalpy.learning_algs import run_stochastic_Lstar
 from aalpy.oracles import RandomWalkEqOracle
-from aalpy.utils import load_automaton_from_file
+from aalpy.utils import load_automaton_from_file, get_correct_prop_values
+from aalpy.utils.HelperFunctions import is_numpy_available
+from aalpy.utils.ModelChecking import evaluate_all_properties_with_numpy
 
 
 class StochasticTest(unittest.TestCase):
@@ -68,3 +70,35 @@ class StochasticTest(unittest.TestCase):
                                 assert False
 
         assert True
+
+    def test_parallel_tree_queries(self):
+        import random
+        from aalpy.utils import generate_random_mdp
+
+        random.seed(1)
+        mdp = generate_random_mdp(4, 2, 3)
+        input_alphabet = mdp.get_input_alphabet()
+
+        sul = AutomatonSUL(mdp)
+        eq_oracle = RandomWalkEqOracle(input_alphabet, sul=sul, num_steps=500, reset_prob=0.25,
+                                       reset_after_cex=True)
+
+        learned_model = run_stochastic_Lstar(input_alphabet=input_alphabet, eq_oracle=eq_oracle, sul=sul,
+                                             min_rounds=5, max_rounds=20, automaton_type='mdp',
+                                             print_level=0, num_processes=2)
+
+        self.assertEqual(len(learned_model.states), len(mdp.states))
+
+    @unittest.skipUnless(is_numpy_available(), 'requires NumPy')
+    def test_model_checking_with_numpy(self):
+        experiments = [('first_grid', 'first_eval'), ('second_grid', 'second_eval'),
+                       ('shared_coin', 'shared_coin_eval'), ('mqtt', 'emqtt_two_client'),
+                       ('tcp', 'tcp_eval'), ('bluetooth', 'bluetooth')]
+
+        for example, properties in experiments:
+            mdp = load_automaton_from_file(f'../DotModels/MDPs/{example}.dot', automaton_type='mdp')
+            results = evaluate_all_properties_with_numpy(mdp, f'../Benchmarking/prism_eval_props/{properties}.props')
+
+            self.assertEqual(len(results), len(get_correct_prop_values(example)))
+            for value, correct_value in zip(results.values(), get_correct_prop_values(example)):
+                self.assertAlmostEqual(value, correct_value, places=4)